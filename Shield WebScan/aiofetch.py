@@ -0,0 +1,252 @@
+"""Asyncio HTTP engine: one event loop and one pooled aiohttp connector.
+
+Async checks run as tasks on a single background event loop, so one
+process can keep many scans in flight without a thread per scan. Every
+scan gets its own ClientSession (and cookie jar) on the shared connector,
+which keeps connections alive between requests to the same host.
+
+aiohttp is optional; without it AVAILABLE is False and the threaded
+checks in app.py are the only engine.
+"""
+import asyncio
+import contextlib
+import hashlib
+import threading
+import time
+from urllib.parse import urlsplit
+
+from requests.cookies import RequestsCookieJar
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from budget import charge_request
+from extractor import extract_page
+from fetch import MAX_BODY_BYTES, BODY_CHUNK_SIZE
+from metrics import record_bytes, record_http
+from ratelimit import limiter_for, parse_retry_after
+
+AVAILABLE = aiohttp is not None
+
+# Connections kept open in total and per host, and seconds an idle one is kept
+CONNECTION_LIMIT = 512
+CONNECTIONS_PER_HOST = 32
+KEEPALIVE_TIMEOUT = 30
+# Seconds any one request may take, body included
+REQUEST_TIMEOUT = 30
+
+_loop = None
+_connector = None
+_loop_lock = threading.Lock()
+
+
+def engine_loop():
+    """The engine's event loop, started in a daemon thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="aio-engine", daemon=True).start()
+        return _loop
+
+
+def submit(coroutine):
+    """Schedule coroutine on the engine loop and return a concurrent Future."""
+    return asyncio.run_coroutine_threadsafe(coroutine, engine_loop())
+
+
+def new_client(headers=None, cookies=None):
+    """A ClientSession on the shared connector with its own cookie jar.
+
+    Must be called on the engine loop. Closing it leaves the connector and
+    its pooled connections open.
+    """
+    global _connector
+    if not AVAILABLE:
+        raise RuntimeError("The async engine needs aiohttp (pip install aiohttp)")
+    if _connector is None:
+        _connector = aiohttp.TCPConnector(limit=CONNECTION_LIMIT, limit_per_host=CONNECTIONS_PER_HOST,
+                                          keepalive_timeout=KEEPALIVE_TIMEOUT)
+    # unsafe allows cookies from hosts given as IP addresses
+    jar = aiohttp.CookieJar(unsafe=True)
+    if cookies:
+        jar.update_cookies(cookies)
+    client = aiohttp.ClientSession(connector=_connector, connector_owner=False, headers=headers,
+                                   cookie_jar=jar, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+    return client
+
+
+def isolated_client(client):
+    """A client with a copy of client's headers and cookies, like fetch.isolated_session."""
+    cookies = {cookie.key: cookie.value for cookie in client.cookie_jar}
+    return new_client(client.headers, cookies)
+
+
+class AsyncResponse:
+    """Status, headers, cookies and capped body of one finished request.
+
+    latency is the seconds to the headers, not counting the wait for a slot.
+    """
+
+    def __init__(self, url, status_code, headers, cookies, content, truncated, latency=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.cookies = cookies
+        self.content = content
+        self.truncated = truncated
+        self.latency = latency
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", "replace")
+
+
+@contextlib.asynccontextmanager
+async def stream(client, method, url, **kwargs):
+    """Send one request, paced by the host's limiter, and yield the response with its body unread.
+
+    The caller reads the body (response.content) and records its bytes.
+    response.latency is set to the seconds to the headers.
+    """
+    host = urlsplit(url).hostname
+    charge_request()
+    limiter = limiter_for(host)
+    await limiter.acquire_async()
+    started = time.monotonic()
+    released = False
+    try:
+        async with client.request(method, url, **kwargs) as response:
+            latency = response.latency = time.monotonic() - started
+            record_http(host, latency, status=response.status)
+            if response.status == 429 or response.status >= 500:
+                limiter.release(congested=True, retry_after=parse_retry_after(response))
+            else:
+                limiter.release(latency=latency)
+            released = True
+            yield response
+    except Exception as e:
+        if not released:
+            limiter.release(congested=isinstance(e, (asyncio.TimeoutError, aiohttp.ClientConnectionError)))
+            record_http(host, time.monotonic() - started, error=e)
+        raise
+
+
+async def request(client, method, url, max_bytes=MAX_BODY_BYTES, **kwargs):
+    """Send one request, paced by the host's limiter, and read at most max_bytes of the body."""
+    host = urlsplit(url).hostname
+    async with stream(client, method, url, **kwargs) as response:
+        chunks = []
+        size = 0
+        truncated = False
+        async for chunk in response.content.iter_chunked(BODY_CHUNK_SIZE):
+            if size + len(chunk) > max_bytes:
+                chunks.append(chunk[:max_bytes - size])
+                size = max_bytes
+                truncated = True
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        record_bytes(host, size)
+
+        cookies = RequestsCookieJar()
+        for name, morsel in response.cookies.items():
+            cookies.set(name, morsel.value, domain=morsel["domain"] or host, path=morsel["path"] or "/")
+        return AsyncResponse(str(response.url), response.status, response.headers, cookies,
+                             b"".join(chunks), truncated, response.latency)
+
+
+class AsyncPage:
+    """The async counterpart of fetch.PageContext.
+
+    Call `await page.load()` once; afterwards the same attributes as
+    PageContext are plain reads, so the page can be handed to the
+    synchronous checks. A failed fetch re-raises its error on every read.
+    """
+
+    def __init__(self, url, client, request_headers=None, max_bytes=MAX_BODY_BYTES):
+        self.url = url
+        self.request_headers = request_headers
+        self.max_bytes = max_bytes
+        self.unchanged = False
+        self.previous = None
+        self.links = None
+        self._client = client
+        self._response = None
+        self._error = None
+        self._task = None
+        self._extracted = None
+
+    async def load(self):
+        """Fetch the page once; concurrent callers wait for the same fetch."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._fetch())
+        await asyncio.shield(self._task)
+        return self
+
+    async def _fetch(self):
+        try:
+            self._response = await request(self._client, "GET", self.url, self.max_bytes,
+                                           headers=self.request_headers)
+        except Exception as e:
+            self._error = e
+
+    @property
+    def response(self):
+        if self._error is not None:
+            raise self._error
+        if self._response is None:
+            raise RuntimeError(f"{self.url} has not been loaded")
+        return self._response
+
+    @property
+    def truncated(self):
+        return self.response.truncated
+
+    @property
+    def status_code(self):
+        return self.response.status_code
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+    @property
+    def cookies(self):
+        return self.response.cookies
+
+    @property
+    def content(self):
+        return self.response.content
+
+    @property
+    def content_hash(self):
+        return hashlib.sha1(self.content).hexdigest()
+
+    @property
+    def forms(self):
+        return self._extract().forms
+
+    @property
+    def hrefs(self):
+        return self._extract().hrefs
+
+    @property
+    def scripts(self):
+        return self._extract().scripts
+
+    @property
+    def generators(self):
+        return self._extract().generators
+
+    def _extract(self):
+        if self._extracted is None:
+            self._extracted = extract_page(self.content)
+        return self._extracted
+
+
+def fetch_page_async(url, client, request_headers=None, max_bytes=MAX_BODY_BYTES):
+    """Wrap url in an AsyncPage that fetches it once, on the first load()."""
+    return AsyncPage(url, client, request_headers, max_bytes)
@@ -1,11 +1,46 @@
-from flask import Flask, render_template, url_for, request
+from flask import Flask, render_template, url_for, request, redirect, jsonify, abort, Response, stream_with_context, send_file
+import click
 import requests
-import socket
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-import re
+from urllib.parse import urljoin, urlsplit
+import json
+import asyncio
+import hashlib
+import math
+import multiprocessing
+import time
+from contextlib import aclosing, closing
+from concurrent.futures import ThreadPoolExecutor
+from portscan import scan_ports, parse_ports, worst_case_seconds
+from banners import grab_banners
+from resolver import resolve, reverse_lookup_async
+from ratelimit import RateLimitedAdapter, limiter_for
+from budget import BudgetExhausted, ScanBudget, exhausted, time_left
+from fetch import HTTP_TIMEOUT, fetch_page, isolated_session, read_body
+from aiofetch import fetch_page_async, isolated_client, new_client, submit as submit_async
+from aiofetch import AVAILABLE as ASYNC_ENGINE_AVAILABLE, request as aio_request
+from crawler import crawl, crawl_async, normalize_url
+from seeds import ROBOTS_MAX_BYTES, parse_robots, seed_urls, seed_urls_async
+from cache import ResultCache
+from rescan import PageStore, ScanHistory
+from sqli import BaselineStore, FormTester
+from findings import Info, Note, Problem, FetchFailed, OpenPort, Fact, Technology, MissingHeader, \
+    Cookie, DisallowedPath, AllowedPath, Partial, dump, load, encode
+from fingerprints import detect_technologies
+from scheduler import Check, run_checks, run_checks_async
+from jobs import submit_scan, get_job
+from metrics import carry, render as render_metrics
+from jobqueue import QUEUE_DB, WORKER_CONCURRENCY, JobQueue, run_worker
+from bulk import BULK_PROCESSES, SCANS_PER_PROCESS, PER_HOST_CONCURRENCY, read_targets, run_bulk, start_bulk, get_run
+
+try:
+    # Flask's async extra, without which async views cannot run
+    import asgiref
+except ImportError:
+    asgiref = None
 
 app = Flask(__name__)
+# Keep check results in scan order in JSON responses
+app.json.sort_keys = False
 
 # Suppress SSL warnings
 requests.packages.urllib3.disable_warnings()
@@ -14,102 +49,284 @@ requests.packages.urllib3.disable_warnings()
 s = requests.Session()
 s.headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/103.0.0.0 Safari/537.36"
 
-
-def get_forms(url):
-    """Extract forms from HTML content."""
+# Connections kept open per host; enough for the crawl and injection pools
+# plus the other checks running alongside them. Every request is paced by
+# the host's limiter (see ratelimit.py).
+HTTP_POOL_SIZE = 32
+http_adapter = RateLimitedAdapter(pool_connections=16, pool_maxsize=HTTP_POOL_SIZE)
+s.mount("http://", http_adapter)
+s.mount("https://", http_adapter)
+
+# Port scan settings: default port profile (see portscan.parse_ports),
+# connects in flight at once and the longest wait per connect. The actual
+# connect timeout adapts to the target's round-trip time below that.
+PORT_SCAN_PROFILE = "default"
+PORT_SCAN_CONCURRENCY = 256
+PORT_SCAN_TIMEOUT = 1
+# Seconds of the port scan's time kept back for grabbing banners
+PORT_SCAN_WRAP_UP = 5
+
+# Crawl settings for the SQL injection scan: link depth, page budget and
+# pages fetched at once
+CRAWL_MAX_DEPTH = 2
+CRAWL_MAX_PAGES = 30
+CRAWL_CONCURRENCY = 8
+
+# Forms injected at once, shared by all running scans
+INJECTION_CONCURRENCY = 8
+injection_pool = ThreadPoolExecutor(max_workers=INJECTION_CONCURRENCY, thread_name_prefix="inject")
+
+# Result cache: memory budget in bytes and an optional SQLite file (for
+# example "scan_cache.sqlite3") that keeps results across restarts
+RESULT_CACHE_BYTES = 32 * 1024 * 1024
+RESULT_CACHE_DB = None
+result_cache = ResultCache(RESULT_CACHE_BYTES, RESULT_CACHE_DB)
+# Per-page validators and verdicts, and last results per target, for rescans
+page_store = PageStore(result_cache)
+scan_history = ScanHistory(result_cache)
+# Baseline responses of tested forms, so a rescan soon after does not refetch them
+baseline_store = BaselineStore(result_cache)
+
+# Seconds each check's results are reused for the same target and settings.
+# DNS and ports change rarely; headers and cookies more often.
+CHECK_TTLS = {
+    "sql injection scan": 1800,
+    "open port scan": 3600,
+    "host details": 3600,
+    "robots txt": 1800,
+    "technology details": 600,
+    "security headers": 300,
+    "cookies": 300,
+}
+
+# Seconds each /scan check may run before it is reported as timed out
+CHECK_DEADLINES = {
+    "sql injection scan": 60,
+    "open port scan": 60,
+    "host details": 15,
+    "robots txt": 15,
+    "technology details": 15,
+    "security headers": 15,
+    "cookies": 15,
+}
+
+
+def get_forms(url, page=None):
+    """Extract details of forms from HTML content."""
     try:
-        response = s.get(url)
-        soup = BeautifulSoup(response.content, "html.parser")
-        return soup.find_all("form")
+        page = page or fetch_page(url, s)
+        return page.forms
     except Exception as e:
         return []
 
 
-def form_details(form):
-    """Extract details of forms."""
-    details_of_form = {}
-    action = form.attrs.get("action")
-    method = form.attrs.get("method", "get")
-    inputs = []
-
-    for input_tag in form.find_all("input"):
-        input_type = input_tag.attrs.get("type", "text")
-        input_name = input_tag.attrs.get("name")
-        input_value = input_tag.attrs.get("value", "")
-        inputs.append({
-            "type": input_type,
-            "name": input_name,
-            "value": input_value,
-        })
-
-    details_of_form['action'] = action
-    details_of_form['method'] = method
-    details_of_form['inputs'] = inputs
-    return details_of_form
-
-
-def vulnerable(response):
-    """Check for SQL injection vulnerability."""
-    errors = {
-        "quoted string not properly terminated",
-        "unclosed quotation mark after the character string",
-        "you have an error in your SQL syntax"
-    }
-    for error in errors:
-        if error in response.content.decode().lower():
-            return True
-    return False
+def form_fingerprint(url, details):
+    """Identify a form by where it submits and what fields it sends."""
+    action = normalize_url(urljoin(url, details["action"]))
+    fields = tuple(sorted((str(field["name"]), field["type"]) for field in details["inputs"]))
+    return action, details["method"].lower(), fields
 
 
-def sql_injection_scan(url):
-    """Scan for SQL injection vulnerabilities in forms."""
-    forms = get_forms(url)
-    results = []
+def inject_form(url, details, session=None):
+    """Test one form found on url for SQL injection (see sqli.FormTester).
 
-    for form in forms:
-        details = form_details(form)
-
-        for i in "\"'":
-            data = {}
-            for input_tag in details["inputs"]:
-                if input_tag["type"] == "hidden" or input_tag["value"]:
-                    data[input_tag['name']] = input_tag["value"] + i
-                elif input_tag["type"] != "submit":
-                    data[input_tag['name']] = f"test{i}"
-
-            if details["method"] == "post":
-                res = s.post(urljoin(url, details["action"]), data=data)
-            elif details["method"] == "get":
-                res = s.get(urljoin(url, details["action"]), params=data)
-
-            if res.status_code == 200:
-                if vulnerable(res):
-                    results.append(f"SQL injection attack vulnerability in link: {urljoin(url, details['action'])}")
+    The form's baseline response is reused from baseline_store when a
+    recent scan fetched it, and stored there otherwise.
+    """
+    session = session or s
+    action_url = urljoin(url, details["action"])
+    key = json.dumps(form_fingerprint(url, details))
+    tester = FormTester(action_url, details, baseline_store.get(key))
+    plan = tester.plan()
+
+    try:
+        data = next(plan)
+        while True:
+            try:
+                if details["method"].lower() == "post":
+                    res = session.post(action_url, data=data, stream=True, timeout=HTTP_TIMEOUT)
                 else:
-                    results.append("No SQL injection attack vulnerability detected")
-                    break
+                    res = session.get(action_url, params=data, stream=True, timeout=HTTP_TIMEOUT)
+                read_body(res)
+            except BudgetExhausted:
+                # Not tested, rather than failed; the check is marked partial
+                return []
+            except Exception as e:
+                # A request the budget's clock cut off did not fail either
+                return [] if exhausted() else [FetchFailed(action_url)]
+            data = plan.send(res)
+    except StopIteration as finished:
+        return finished.value
+    finally:
+        if tester.fetched_baseline:
+            baseline_store.save(key, tester.baseline)
+
+
+async def inject_form_async(url, details, client):
+    """Async variant of inject_form; the form gets its own copy of client's cookies."""
+    action_url = urljoin(url, details["action"])
+    key = json.dumps(form_fingerprint(url, details))
+    tester = FormTester(action_url, details, baseline_store.get(key))
+    plan = tester.plan()
+
+    async with isolated_client(client) as form_client:
+        try:
+            data = next(plan)
+            while True:
+                try:
+                    if details["method"].lower() == "post":
+                        res = await aio_request(form_client, "POST", action_url, data=data)
+                    else:
+                        res = await aio_request(form_client, "GET", action_url, params=data)
+                except BudgetExhausted:
+                    return []
+                except Exception as e:
+                    return [FetchFailed(action_url)]
+                data = plan.send(res)
+        except StopIteration as finished:
+            return finished.value
+        finally:
+            if tester.fetched_baseline:
+                baseline_store.save(key, tester.baseline)
+
+
+def page_forms(found_page):
+    """(fingerprint key, details, stored result or None) for each form on a crawled page."""
+    if found_page.unchanged:
+        stored = found_page.previous.get("verdicts", {})
+        return [(key, form["details"], load(form["lines"])) for key, form in stored.items()]
+    return [(json.dumps(form_fingerprint(found_page.url, details)), details, None)
+            for details in get_forms(found_page.url, found_page)]
+
+
+class InjectionScan:
+    """Bookkeeping for one SQL injection scan, shared by the sync and async variants.
+
+    Forms are deduplicated by fingerprint. Stored verdicts of unchanged pages
+    are reused unless the form could not be fetched last time.
+    """
+
+    def __init__(self):
+        self.forms = {}
+        self.verdicts = {}
+        self.page_records = []
+        self.duplicates = 0
+        self.reused = 0
+
+    def add_page(self, found_page):
+        """Note a crawled page and return the (key, url, details) of forms that need testing."""
+        to_test = []
+        found_forms = page_forms(found_page)
+        self.reused += found_page.unchanged
+        for key, details, lines in found_forms:
+            if key in self.forms:
+                self.duplicates += 1
+                continue
+            self.forms[key] = details
+            if lines and not isinstance(lines[0], FetchFailed):
+                self.verdicts[key] = lines
             else:
-                results.append(f"Failed to fetch: {urljoin(url, details['action'])}")
-                break
-
-    return results
-
-
-def open_port_scan(target):
-    """Perform open port scan on target."""
+                to_test.append((key, found_page.url, details))
+
+        if found_page.status_code in (200, 304):
+            self.page_records.append((found_page.url, found_page.headers, found_page.previous,
+                                      None if found_page.status_code == 304 else found_page.content_hash,
+                                      found_page.links, [key for key, _, _ in found_forms]))
+        return to_test
+
+    def finish(self, verdicts):
+        """Merge in new verdicts, save each page for the next rescan and return the result records."""
+        self.verdicts.update(verdicts)
+        results = []
+        for key in self.forms:
+            results.extend(self.verdicts[key])
+
+        if self.duplicates:
+            results.append(Note(f"Skipped {self.duplicates} duplicate form(s) already tested on another page."))
+        if self.reused:
+            results.append(Note(f"Reused earlier results for {self.reused} unchanged page(s)."))
+
+        # Remember what each page looked like for the next rescan
+        for page_url, headers, previous, content_hash, links, keys in self.page_records:
+            previous = previous or {}
+            page_store.save(page_url, {
+                "etag": headers.get("ETag") or previous.get("etag"),
+                "last_modified": headers.get("Last-Modified") or previous.get("last_modified"),
+                "hash": content_hash or previous.get("hash"),
+                "links": links,
+                "verdicts": {key: {"details": self.forms[key], "lines": dump(self.verdicts[key])}
+                             for key in keys if key in self.forms},
+            })
+
+        return results
+
+
+def sql_injection_scan(url, page=None, robots_page=None):
+    """Scan for SQL injection vulnerabilities in forms across the site.
+
+    Forms are injected on injection_pool while the crawl continues. Each form
+    gets its own cookie jar so one form's session cannot leak into another's,
+    and results are reported in the order the forms were found. Pages that
+    have not changed since the last scan reuse their stored verdicts.
+    Besides links, the crawl takes pages from the sitemaps in robots.txt.
+    """
+    scan = InjectionScan()
+    pending = {}
+    with closing(seed_urls(url, s, robots_page)) as seeds:
+        pages = crawl(url, s, page, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES,
+                      concurrency=CRAWL_CONCURRENCY, page_store=page_store, seeds=seeds)
+        for found_page in pages:
+            for key, page_url, details in scan.add_page(found_page):
+                pending[key] = injection_pool.submit(carry(inject_form), page_url, details, isolated_session(s))
+
+    return scan.finish({key: future.result() for key, future in pending.items()})
+
+
+async def sql_injection_scan_async(url, client, page=None, robots_page=None):
+    """Async variant of sql_injection_scan, injecting forms as tasks while the crawl continues."""
+    scan = InjectionScan()
+    pending = {}
+    try:
+        async with aclosing(seed_urls_async(url, client, robots_page)) as seeds:
+            pages = crawl_async(url, client, page, max_depth=CRAWL_MAX_DEPTH, max_pages=CRAWL_MAX_PAGES,
+                                concurrency=CRAWL_CONCURRENCY, page_store=page_store, seeds=seeds)
+            async for found_page in pages:
+                for key, page_url, details in scan.add_page(found_page):
+                    pending[key] = asyncio.ensure_future(inject_form_async(page_url, details, client))
+        lines = await asyncio.gather(*pending.values())
+    finally:
+        # Stop outstanding injections if the check is cancelled at its deadline
+        for task in pending.values():
+            task.cancel()
+    return scan.finish(dict(zip(pending, lines)))
+
+
+def open_port_scan(target, ports=None, concurrency=PORT_SCAN_CONCURRENCY, timeout=PORT_SCAN_TIMEOUT):
+    """Perform open port scan on target.
+
+    Probing stops PORT_SCAN_WRAP_UP seconds before the check or scan runs
+    out of time, and the ports found by then are reported as a partial result.
+    """
+    ports = ports or parse_ports(PORT_SCAN_PROFILE)
     results = []
+    left = time_left()
+    stop_at = None if left is None else time.monotonic() + left - PORT_SCAN_WRAP_UP
 
     try:
-        results.append(f"Scanning open ports on {target}...")
-        for port in range(1, 1025):
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
-            result = sock.connect_ex((target, port))
-            if result == 0:
-                results.append(f"Port {port}: Open")
-            sock.close()
+        results.append(Info(f"Scanning open ports on {target}..."))
+        host_ip = resolve(target)[0]
+        limiter = limiter_for(target, "connect")
+        open_ports = scan_ports(host_ip, ports, concurrency=concurrency, timeout=timeout, limiter=limiter,
+                                deadline=stop_at)
+        cut_short = stop_at is not None and time.monotonic() >= stop_at
+        banners = grab_banners(host_ip, open_ports, target, limiter)
+        for port in open_ports:
+            service, banner = banners[port]
+            results.append(OpenPort(port, service or None, banner or None))
+        if cut_short:
+            results.append(Partial("deadline"))
     except Exception as e:
-        results.append(f"Error during port scan: {str(e)}")
+        results.append(Problem(f"Error during port scan: {str(e)}"))
 
     return results
 
@@ -119,107 +336,235 @@ def get_host_details(target):
     results = []
 
     try:
-        results.append(f"Getting host details for {target}...")
-        host_ip = socket.gethostbyname(target)
-        results.append(f"Host IP: {host_ip}")
-        host_name, _, _ = socket.gethostbyaddr(host_ip)
-        results.append(f"Host Name: {host_name}")
+        results.append(Info(f"Getting host details for {target}..."))
+        addresses = resolve(target)
+        # Reverse lookups for every address run at the same time
+        lookups = [(host_ip, reverse_lookup_async(host_ip)) for host_ip in addresses]
+        for host_ip, lookup in lookups:
+            results.append(Fact("Host IP", host_ip))
+            try:
+                results.append(Fact("Host Name", lookup.result()))
+            except Exception as e:
+                results.append(Info(f"No host name for {host_ip}: {str(e)}"))
     except Exception as e:
-        results.append(f"Error getting host details: {str(e)}")
+        results.append(Problem(f"Error getting host details: {str(e)}"))
 
     return results
 
 
-def check_robots_txt(url):
-    """Check robots.txt for disallowed paths."""
-    results = []
+def robots_url(url):
+    """The robots.txt URL of url's site."""
+    return urljoin(url, "/robots.txt")
+
 
+def check_robots_txt(url, page=None):
+    """Check robots.txt for disallowed and allowed paths and the sitemaps it lists."""
     try:
-        response = s.get(urljoin(url, "/robots.txt"))
-        if response.status_code == 200:
-            results.append("robots.txt exists. Checking for disallowed paths...")
-            disallowed_paths = re.findall(r"Disallow: (.*)", response.text)
-            if disallowed_paths:
-                results.append("Disallowed paths:")
-                for path in disallowed_paths:
-                    results.append(path)
-            else:
-                results.append("No disallowed paths found in robots.txt")
-        else:
-            results.append("robots.txt does not exist.")
+        page = page or fetch_page(robots_url(url), s, max_bytes=ROBOTS_MAX_BYTES)
+        return robots_report(page)
+    except Exception as e:
+        return [Problem(f"Error checking robots.txt: {str(e)}")]
+
+
+async def check_robots_txt_async(url, client, page=None):
+    """Async variant of check_robots_txt."""
+    try:
+        page = page or fetch_page_async(robots_url(url), client, max_bytes=ROBOTS_MAX_BYTES)
+        await page.load()
+        return robots_report(page)
     except Exception as e:
-        results.append(f"Error checking robots.txt: {str(e)}")
+        return [Problem(f"Error checking robots.txt: {str(e)}")]
 
+
+def robots_report(page):
+    """Result records for a fetched robots.txt."""
+    results = []
+    if page.status_code == 200:
+        results.append(Info("robots.txt exists. Checking for disallowed paths..."))
+        robots = parse_robots(page.content)
+        if robots.disallowed:
+            results.append(Info("Disallowed paths:"))
+            for path in robots.disallowed:
+                results.append(DisallowedPath(path))
+        else:
+            results.append(Info("No disallowed paths found in robots.txt"))
+        if robots.allowed:
+            results.append(Info("Allowed paths:"))
+            for path in robots.allowed:
+                results.append(AllowedPath(path))
+        for sitemap in robots.sitemaps:
+            results.append(Fact("Sitemap", sitemap))
+    else:
+        results.append(Info("robots.txt does not exist."))
     return results
 
 
-def get_technology_details(url):
-    """Get technology details."""
+def get_technology_details(url, page=None):
+    """Get technology details: the Server header, then every technology fingerprints.py recognises."""
     results = []
 
     try:
-        response = s.get(url)
-        if response.status_code == 200:
-            server_header = response.headers.get('Server')
+        page = page or fetch_page(url, s)
+        if page.status_code == 200:
+            server_header = page.headers.get('Server')
             if server_header:
-                results.append(f"Server: {server_header}")
+                results.append(Fact("Server", server_header))
             else:
-                results.append("Server header not found.")
-            # Add more technology detection methods here
+                results.append(Info("Server header not found."))
+            technologies = detect_technologies(page)
+            for name, version, category in technologies:
+                results.append(Technology(name, version, category))
+            if not technologies:
+                results.append(Info("No other technologies recognised."))
         else:
-            results.append("Failed to fetch technology details.")
+            results.append(Problem("Failed to fetch technology details."))
     except Exception as e:
-        results.append(f"Error getting technology details: {str(e)}")
+        results.append(Problem(f"Error getting technology details: {str(e)}"))
 
     return results
 
 
-def check_security_headers(url):
+def check_security_headers(url, page=None):
     """Check for missing security headers."""
     results = []
 
     try:
-        response = s.get(url)
-        if response.status_code == 200:
-            headers = response.headers
+        page = page or fetch_page(url, s)
+        if page.status_code == 200:
+            headers = page.headers
             if 'X-Frame-Options' not in headers:
-                results.append("Missing X-Frame-Options header.")
+                results.append(MissingHeader("X-Frame-Options"))
             if 'X-XSS-Protection' not in headers:
-                results.append("Missing X-XSS-Protection header.")
+                results.append(MissingHeader("X-XSS-Protection"))
             if 'X-Content-Type-Options' not in headers:
-                results.append("Missing X-Content-Type-Options header.")
+                results.append(MissingHeader("X-Content-Type-Options"))
             # Add more security headers to check here
             else:
-                results.append("All required security headers present.")
+                results.append(Info("All required security headers present."))
         else:
-            results.append("Failed to fetch security headers.")
+            results.append(Problem("Failed to fetch security headers."))
     except Exception as e:
-        results.append(f"Error checking security headers: {str(e)}")
+        results.append(Problem(f"Error checking security headers: {str(e)}"))
 
     return results
 
 
-def check_cookies(url):
+def check_cookies(url, page=None):
     """Check for cookies."""
     results = []
 
     try:
-        response = s.get(url)
-        if response.status_code == 200:
-            cookies = response.cookies
+        page = page or fetch_page(url, s)
+        if page.status_code == 200:
+            cookies = page.cookies
             if cookies:
-                results.append("Cookies found:")
+                results.append(Info("Cookies found:"))
                 for cookie in cookies:
-                    results.append(f"{cookie.name}: {cookie.value}")
+                    results.append(Cookie(cookie.name, cookie.value))
             else:
-                results.append("No cookies found.")
+                results.append(Info("No cookies found."))
         else:
-            results.append("Failed to fetch cookies.")
+            results.append(Problem("Failed to fetch cookies."))
     except Exception as e:
-        results.append(f"Error checking cookies: {str(e)}")
+        results.append(Problem(f"Error checking cookies: {str(e)}"))
 
     return results
 
+
+async def get_forms_async(url, client, page=None):
+    """Async variant of get_forms."""
+    page = page or fetch_page_async(url, client)
+    await page.load()
+    return get_forms(url, page)
+
+
+async def get_technology_details_async(url, client, page=None):
+    """Async variant of get_technology_details."""
+    page = page or fetch_page_async(url, client)
+    await page.load()
+    return get_technology_details(url, page)
+
+
+async def check_security_headers_async(url, client, page=None):
+    """Async variant of check_security_headers."""
+    page = page or fetch_page_async(url, client)
+    await page.load()
+    return check_security_headers(url, page)
+
+
+async def check_cookies_async(url, client, page=None):
+    """Async variant of check_cookies."""
+    page = page or fetch_page_async(url, client)
+    await page.load()
+    return check_cookies(url, page)
+
+
+def build_checks(url, ports=None):
+    """Build the list of checks run by one scan of url.
+
+    ports is the list of TCP ports to scan; PORT_SCAN_PROFILE by default.
+    """
+    # Fetch the landing page and robots.txt once and share them between the checks
+    page = fetch_page(url, s)
+    robots_page = fetch_page(robots_url(url), s, max_bytes=ROBOTS_MAX_BYTES)
+    target = urlsplit(url).hostname
+    page_key = normalize_url(url)
+    ports = ports or parse_ports(PORT_SCAN_PROFILE)
+    ports_key = hashlib.sha1(",".join(map(str, ports)).encode()).hexdigest()
+
+    # (name, function, arguments, what the result depends on)
+    checks = [
+        ("sql injection scan", sql_injection_scan, (url, page, robots_page),
+         [page_key, CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES]),
+        ("open port scan", open_port_scan, (target, ports), [target, ports_key]),
+        ("host details", get_host_details, (target,), [target]),
+        ("robots txt", check_robots_txt, (url, robots_page), [page_key]),
+        ("technology details", get_technology_details, (url, page), [page_key]),
+        ("security headers", check_security_headers, (url, page), [page_key]),
+        ("cookies", check_cookies, (url, page), [page_key]),
+    ]
+    deadlines = dict(CHECK_DEADLINES)
+    # Large port profiles get the time a host that filters every port needs
+    deadlines["open port scan"] = max(deadlines["open port scan"], math.ceil(
+        worst_case_seconds(ports, PORT_SCAN_CONCURRENCY, PORT_SCAN_TIMEOUT)) + 2 * PORT_SCAN_WRAP_UP)
+    return [
+        Check(name, func, args, deadlines[name], cache_key=json.dumps([name] + key), ttl=CHECK_TTLS[name],
+              target=target)
+        for name, func, args, key in checks
+    ]
+
+
+def build_async_checks(url, client, ports=None):
+    """The checks of build_checks as coroutines sharing one async client.
+
+    The port scan and host lookups already use asyncio internally; they run
+    in a worker thread with a loop of their own.
+    """
+    page = fetch_page_async(url, client)
+    robots_page = fetch_page_async(robots_url(url), client, max_bytes=ROBOTS_MAX_BYTES)
+    target = urlsplit(url).hostname
+    ports = ports or parse_ports(PORT_SCAN_PROFILE)
+    variants = {
+        "sql injection scan": (sql_injection_scan_async, (url, client, page, robots_page)),
+        "open port scan": (asyncio.to_thread, (open_port_scan, target, ports)),
+        "host details": (asyncio.to_thread, (get_host_details, target)),
+        "robots txt": (check_robots_txt_async, (url, client, robots_page)),
+        "technology details": (get_technology_details_async, (url, client, page)),
+        "security headers": (check_security_headers_async, (url, client, page)),
+        "cookies": (check_cookies_async, (url, client, page)),
+    }
+    checks = build_checks(url, ports)
+    for check in checks:
+        check.func, check.args = variants[check.name]
+    return checks
+
+
+async def run_scan_async(url, ports=None, timings=None, budget=None):
+    """Run one scan on the async engine loop with a client of its own."""
+    async with new_client(s.headers) as client:
+        return await run_checks_async(build_async_checks(url, client, ports), cache=result_cache, timings=timings,
+                                      budget=budget)
+
 #------------------------------
 
 @app.route("/", methods=["GET", "POST"])
@@ -235,20 +580,264 @@ def scan():
         url_to_be_checked = request.form.get("url")
         if not url_to_be_checked:
             return render_template("scan.html", error="Please enter a URL.")
+        try:
+            ports = parse_ports(request.form.get("ports") or PORT_SCAN_PROFILE)
+        except ValueError as e:
+            return render_template("scan.html", error=str(e))
+
+        # Run the scan in the background and hand back its job ID
+        job = submit_scan(url_to_be_checked, build_checks(url_to_be_checked, ports), result_cache, scan_history,
+                          ScanBudget())
+        if request.accept_mimetypes.best_match(["text/html", "application/json"]) == "application/json":
+            return jsonify({
+                "job_id": job.id,
+                "status_url": url_for("scan_status", job_id=job.id),
+                "events_url": url_for("scan_events", job_id=job.id),
+            }), 202
+        return redirect(url_for("scan_results", job_id=job.id), code=303)
+
+    return render_template("scan.html")
 
-        results = {
-            "sql injection scan": sql_injection_scan(url_to_be_checked),
-            "open port scan": open_port_scan(url_to_be_checked.split("//")[1].split("/")[0]),
-            "host details": get_host_details(url_to_be_checked.split("//")[1].split("/")[0]),
-            "robots txt": check_robots_txt(url_to_be_checked),
-            "technology details": get_technology_details(url_to_be_checked),
-            "security headers": check_security_headers(url_to_be_checked),
-            "cookies": check_cookies(url_to_be_checked)
-        }
 
-        return render_template("results.html", results=results, url=url_to_be_checked)
+@app.route("/scan/async", methods=["POST"])
+def scan_async():
+    """Run a scan on the asyncio engine and return its results as JSON.
 
-    return render_template("scan.html")
+    Needs aiohttp and Flask's async extra: pip install "flask[async]" aiohttp
+    """
+    if not ASYNC_ENGINE_AVAILABLE or asgiref is None:
+        return jsonify({"error": 'The async engine needs aiohttp and Flask\'s async extra installed '
+                                 '(pip install "flask[async]" aiohttp).'}), 501
+    # A sync view, so the check above runs even where async views cannot
+    return app.ensure_sync(_scan_async)()
+
+
+async def _scan_async():
+    data = request.get_json(silent=True) or request.form
+    url_to_be_checked = data.get("url")
+    if not url_to_be_checked:
+        return jsonify({"error": "Please enter a URL."}), 400
+    try:
+        ports = parse_ports(data.get("ports") or PORT_SCAN_PROFILE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # The scan runs on the engine's loop; this request only waits for it
+    timings = {}
+    budget = ScanBudget()
+    results = await asyncio.wrap_future(submit_async(run_scan_async(url_to_be_checked, ports, timings, budget)))
+    return json_response({"url": url_to_be_checked, "results": results, "timings": timings,
+                          "budget": budget.to_dict()})
+
+
+@app.route("/api/scan", methods=["POST"])
+def api_scan():
+    """Run a scan and return its result records as JSON once every check has ended.
+
+    Each record is an object with a "type" (see findings.RECORD_TYPES) and
+    its fields. Takes JSON or form data with "url" and optional "ports".
+    """
+    data = request.get_json(silent=True) or request.form
+    url_to_be_checked = data.get("url")
+    if not url_to_be_checked:
+        return jsonify({"error": "Please enter a URL."}), 400
+    try:
+        ports = parse_ports(data.get("ports") or PORT_SCAN_PROFILE)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    timings = {}
+    budget = ScanBudget()
+    results = run_checks(build_checks(url_to_be_checked, ports), cache=result_cache, timings=timings, budget=budget)
+    return json_response({"url": url_to_be_checked, "results": results, "timings": timings,
+                          "budget": budget.to_dict()})
+
+
+def json_response(value, status=200):
+    """A JSON response for value, which may hold result records, via findings.encode."""
+    return Response(encode(value), status=status, mimetype="application/json")
+
+
+def get_job_or_404(job_id):
+    job = get_job(job_id)
+    if job is None:
+        abort(404)
+    return job
+
+
+@app.route("/scan/<job_id>")
+def scan_results(job_id):
+    job = get_job_or_404(job_id)
+    return render_template("results.html", results=job.ordered_results(), url=job.url,
+                           categories=job.check_names, job_id=job.id, finished=job.done, timings=job.timings)
+
+
+@app.route("/scan/<job_id>/status")
+def scan_status(job_id):
+    return json_response(get_job_or_404(job_id).to_dict())
+
+
+@app.route("/scan/<job_id>/events")
+def scan_events(job_id):
+    """Stream each check's results as a Server-Sent Event when it finishes."""
+    job = get_job_or_404(job_id)
+
+    def events():
+        seen = 0
+        while True:
+            updates = job.wait_for_update(seen, timeout=15)
+            for name, result in updates:
+                lines = [{"kind": record.kind, "text": str(record)} for record in result]
+                yield f"event: result\ndata: {json.dumps({'check': name, 'results': lines})}\n\n"
+            seen += len(updates)
+            if job.done and seen == len(job.events):
+                yield "event: done\ndata: {}\n\n"
+                return
+            if not updates:
+                # Keep idle connections from being closed by proxies
+                yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
+
+
+#----------------------------------
+
+@app.route("/metrics")
+def metrics():
+    """Check, HTTP and connect metrics in the Prometheus text format."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+#----------------------------------
+
+@app.route("/api/bulk", methods=["POST"])
+def bulk_scan():
+    """Start a bulk scan from a JSON list of targets or an uploaded targets file."""
+    if "targets" in request.files:
+        lines = request.files["targets"].read().decode("utf-8", "replace").splitlines()
+    else:
+        lines = (request.get_json(silent=True) or {}).get("targets") or []
+    targets = list(read_targets(lines))
+    if not targets:
+        return jsonify({"error": "No targets given."}), 400
+
+    run = start_bulk(targets)
+    return jsonify({
+        "run_id": run.id,
+        "targets": len(targets),
+        "status_url": url_for("bulk_status", run_id=run.id),
+        "results_url": url_for("bulk_results", run_id=run.id),
+    }), 202
+
+
+def get_run_or_404(run_id):
+    run = get_run(run_id)
+    if run is None:
+        abort(404)
+    return run
+
+
+@app.route("/api/bulk/<run_id>")
+def bulk_status(run_id):
+    return jsonify(get_run_or_404(run_id).to_dict())
+
+
+@app.route("/api/bulk/<run_id>/results")
+def bulk_results(run_id):
+    """The JSON Lines written so far."""
+    run = get_run_or_404(run_id)
+    return send_file(run.output, mimetype="application/x-ndjson")
+
+
+#----------------------------------
+
+_job_queue = None
+
+
+def get_job_queue():
+    """The shared scan queue, opened on first use."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(QUEUE_DB)
+    return _job_queue
+
+
+@app.route("/api/queue", methods=["GET", "POST"])
+def queue_scans():
+    """Queue scans of a JSON list of targets for the workers, or count jobs by status."""
+    if request.method == "GET":
+        return jsonify(get_job_queue().counts())
+
+    data = request.get_json(silent=True) or {}
+    targets = list(read_targets(data.get("targets") or []))
+    if not targets:
+        return jsonify({"error": "No targets given."}), 400
+    try:
+        ports = parse_ports(data["ports"]) if data.get("ports") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job_ids = [get_job_queue().enqueue(target, ports) for target in targets]
+    return jsonify({
+        "jobs": [{"job_id": job_id, "status_url": url_for("queued_scan", job_id=job_id)} for job_id in job_ids],
+    }), 202
+
+
+@app.route("/api/queue/<job_id>")
+def queued_scan(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+
+@app.cli.command("queue-scan")
+@click.argument("targets_file", type=click.File("r"))
+@click.option("--db", default=QUEUE_DB, show_default=True, help="Queue file shared with the workers.")
+@click.option("--ports", default=None, help="Port profile or list, as in the scan form.")
+def queue_scan_command(targets_file, db, ports):
+    """Queue a scan of every URL in TARGETS_FILE ("-" for stdin) for the workers."""
+    job_queue = JobQueue(db)
+    ports = parse_ports(ports) if ports else None
+    count = 0
+    for target in read_targets(targets_file):
+        click.echo(job_queue.enqueue(target, ports))
+        count += 1
+    click.echo(f"{count} scans queued", err=True)
+
+
+@app.cli.command("worker")
+@click.option("--db", default=QUEUE_DB, show_default=True, help="Queue file shared with the coordinator.")
+@click.option("--processes", default=1, show_default=True, help="Worker processes to start.")
+@click.option("--concurrency", default=WORKER_CONCURRENCY, show_default=True, help="Scans each process runs at once.")
+@click.option("--idle-exit", type=float, default=None, help="Exit after this many idle seconds.")
+def worker_command(db, processes, concurrency, idle_exit):
+    """Run queued scans until stopped."""
+    if processes == 1:
+        click.echo(f"{run_worker(db, concurrency, idle_exit=idle_exit)} scans run", err=True)
+        return
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=run_worker, args=(db, concurrency), kwargs={"idle_exit": idle_exit})
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+@app.cli.command("bulk-scan")
+@click.argument("targets_file", type=click.File("r"))
+@click.option("-o", "--output", default="results.jsonl", show_default=True, help="JSON Lines file to append to.")
+@click.option("--processes", default=BULK_PROCESSES, show_default=True, help="Worker processes.")
+@click.option("--scans-per-process", default=SCANS_PER_PROCESS, show_default=True, help="Scans each worker runs at once.")
+@click.option("--per-host", default=PER_HOST_CONCURRENCY, show_default=True, help="Scans of one host at once.")
+def bulk_scan_command(targets_file, output, processes, scans_per_process, per_host):
+    """Scan every URL in TARGETS_FILE ("-" for stdin), one per line."""
+    def progress(run):
+        click.echo(f"{run.completed} targets scanned, {run.rate:.1f} targets/min", err=True)
+
+    run_bulk(read_targets(targets_file), output, processes, scans_per_process, per_host, progress)
 
 
 if __name__ == "__main__":
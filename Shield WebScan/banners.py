@@ -0,0 +1,147 @@
+"""Service banner grabbing for open ports found by the port scan."""
+import asyncio
+import re
+import ssl
+import time
+
+from budget import allow_connect
+from metrics import record_connect
+
+# Bytes read from a service and seconds spent per port
+BANNER_MAX_BYTES = 1024
+BANNER_TIMEOUT = 2.0
+# Seconds to wait for a service that speaks first (SSH, SMTP, FTP...)
+GREETING_TIMEOUT = 0.5
+BANNER_CONCURRENCY = 32
+
+HTTP_PORTS = {80, 81, 591, 3000, 5000, 8000, 8008, 8080, 8081, 8088, 8888, 9000, 9090, 9200}
+TLS_PORTS = {443, 465, 636, 993, 995, 2376, 5986, 6443, 8443, 9443}
+
+# Probes for services that wait for the client to speak first
+PORT_PROBES = {
+    6379: b"PING\r\n",
+    11211: b"version\r\n",
+}
+HTTP_PROBE = b"HEAD / HTTP/1.0\r\nHost: %s\r\nUser-Agent: Shield-WebScan\r\n\r\n"
+
+# Service name -> banner patterns. Compiled once into a single regex.
+SERVICE_SIGNATURES = {
+    "SSH": [rb"^SSH-\d+\.\d+-"],
+    "FTP": [rb"^220[ -][^\r\n]{0,200}?ftp", rb"^220[ -][^\r\n]{0,200}?FileZilla"],
+    "SMTP": [rb"^220[ -][^\r\n]{0,200}?(?:smtp|postfix|exim|sendmail|mail)"],
+    "POP3": [rb"^\+OK"],
+    "IMAP": [rb"^\* OK"],
+    "HTTP": [rb"^HTTP/\d(?:\.\d)? \d{3}"],
+    "Redis": [rb"^\+PONG", rb"^-NOAUTH", rb"^-DENIED Redis"],
+    "Memcached": [rb"^VERSION \d"],
+    "MySQL": [rb"^.{4}\x0a[\d.]+[^\x00]{0,40}\x00", rb"mysql_native_password", rb"caching_sha2_password"],
+    "VNC": [rb"^RFB \d{3}\.\d{3}"],
+    "Telnet": [rb"^\xff[\xfb-\xfe]"],
+    "FTP or SMTP": [rb"^220[ -]"],
+}
+
+
+def _compile(signatures):
+    groups = {}
+    alternatives = []
+    for index, (service, patterns) in enumerate(signatures.items()):
+        group = f"service{index}"
+        groups[group] = service
+        alternatives.append(b"(?P<%s>%s)" % (group.encode(), b"|".join(patterns)))
+    return re.compile(b"|".join(alternatives), re.IGNORECASE | re.DOTALL), groups
+
+
+_matcher, _group_names = _compile(SERVICE_SIGNATURES)
+
+
+def identify_service(banner):
+    """Return the service name a banner (bytes) belongs to, or None."""
+    match = _matcher.search(banner)
+    if match is None:
+        return None
+    return _group_names[match.lastgroup]
+
+
+def describe_banner(banner):
+    """A short printable summary of a banner: its first line, or the HTTP Server header."""
+    text = banner.decode("latin-1")
+    if text.startswith("HTTP/"):
+        server = re.search(r"^Server:\s*(.+?)\r?$", text, re.IGNORECASE | re.MULTILINE)
+        if server:
+            return server.group(1)[:100]
+    first_line = text.splitlines()[0] if text else ""
+    return "".join(ch for ch in first_line if ch.isprintable())[:100]
+
+
+async def _read(reader, timeout):
+    try:
+        return await asyncio.wait_for(reader.read(BANNER_MAX_BYTES), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return b""
+
+
+async def _grab(host_ip, port, hostname, semaphore, limiter):
+    """Connect to one port and return whatever the service says; nothing once the scan's budget is spent."""
+    async with semaphore:
+        if not allow_connect():
+            return b""
+        if limiter is not None:
+            await limiter.acquire_async()
+        try:
+            return await _talk(host_ip, port, hostname)
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+
+async def _talk(host_ip, port, hostname):
+    """Open the connection, send a probe if needed and read the reply."""
+    context = None
+    if port in TLS_PORTS:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    started = time.monotonic()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host_ip, port, ssl=context, server_hostname=hostname if context else None),
+            BANNER_TIMEOUT)
+    except (OSError, asyncio.TimeoutError, ssl.SSLError):
+        record_connect(host_ip, time.monotonic() - started, "error")
+        return b""
+    record_connect(host_ip, time.monotonic() - started, "open")
+
+    try:
+        http_probe = HTTP_PROBE % hostname.encode()
+        if port in HTTP_PORTS or context is not None:
+            writer.write(http_probe)
+        elif port in PORT_PROBES:
+            writer.write(PORT_PROBES[port])
+        else:
+            banner = await _read(reader, GREETING_TIMEOUT)
+            if banner:
+                return banner
+            # Nothing said; many unknown ports are plain HTTP
+            writer.write(http_probe)
+        await writer.drain()
+        return await _read(reader, BANNER_TIMEOUT - GREETING_TIMEOUT)
+    except OSError:
+        return b""
+    finally:
+        writer.close()
+
+
+async def grab_banners_async(host_ip, ports, hostname=None, limiter=None):
+    """Grab banners from every port at once; returns {port: banner bytes}."""
+    semaphore = asyncio.Semaphore(BANNER_CONCURRENCY)
+    hostname = hostname or host_ip
+    banners = await asyncio.gather(*(_grab(host_ip, port, hostname, semaphore, limiter) for port in ports))
+    return dict(zip(ports, banners))
+
+
+def grab_banners(host_ip, ports, hostname=None, limiter=None):
+    """Return {port: (service or None, banner summary)} for the given open ports."""
+    if not ports:
+        return {}
+    banners = asyncio.run(grab_banners_async(host_ip, ports, hostname, limiter))
+    return {port: (identify_service(banner), describe_banner(banner)) for port, banner in banners.items()}
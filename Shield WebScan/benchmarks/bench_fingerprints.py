@@ -0,0 +1,110 @@
+"""Cost per response of technology fingerprinting as the signature table grows.
+
+Pads the real signature table with synthetic technologies, each with a
+header, a script and a body pattern, and times two matchers on the same
+synthetic response:
+  naive   one regex search per signature over its text
+  index   fingerprints.SignatureIndex, one pass per text
+
+The naive matcher is skipped ("-") where it would take minutes.
+
+Usage: python benchmarks/bench_fingerprints.py
+"""
+import os
+import re
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fingerprints import TECHNOLOGY_SIGNATURES, SignatureIndex  # noqa: E402
+
+# Signatures times body bytes above which the naive matcher is not timed
+MAX_NAIVE_WORK = 500_000_000
+FILLER = b'<div class="row"><p>Lorem ipsum dolor sit amet, consectetur.</p></div>\n'
+
+
+def signatures(total):
+    """The real table padded with synthetic technologies to `total` entries."""
+    table = dict(TECHNOLOGY_SIGNATURES)
+    for i in range(total - len(table)):
+        table[f"Synthetic {i}"] = {
+            "category": "Synthetic",
+            "headers": {f"X-Synthetic-{i % 20}": rf"synth{i}(?:/([\d.]+))?"},
+            "scripts": [rf"/synthlib{i}(?:\.min)?\.js"],
+            "html": [rf"data-synthwidget{i}=\"([\d.]+)\""],
+        }
+    return table
+
+
+def make_response(size):
+    """Headers, cookies, generators, scripts and a body of about `size` bytes."""
+    headers = {
+        "Server": "nginx/1.18.0", "X-Powered-By": "PHP/7.4", "Content-Type": "text/html",
+        "X-Synthetic-3": "synth3/2.0", "Cache-Control": "no-cache",
+    }
+    cookies = {"PHPSESSID": "abc"}
+    generators = ["WordPress 6.4.2"]
+    scripts = ["/wp-includes/js/jquery/jquery.min.js", "/static/synthlib7.min.js", "/static/app.js"]
+    markers = b'<div data-synthwidget11="1.2"></div><link href="https://fonts.googleapis.com/css">\n'
+    body = FILLER * (size // len(FILLER) // 2) + markers + FILLER * (size // len(FILLER) // 2)
+    return headers, cookies, generators, scripts, body
+
+
+class NaiveMatcher:
+    """Every signature compiled on its own and searched for separately."""
+
+    def __init__(self, table):
+        self.patterns = []
+        for technology, signature in table.items():
+            for field in ("headers", "cookies"):
+                for name, pattern in signature.get(field, {}).items():
+                    self.patterns.append((technology, field, name.lower(), re.compile(pattern.encode(), re.I)))
+            for field in ("generator", "scripts", "html"):
+                for pattern in signature.get(field, ()):
+                    self.patterns.append((technology, field, None, re.compile(pattern.encode(), re.I)))
+
+    def match(self, headers, cookies, generators, scripts, body):
+        texts = {
+            "headers": {name.lower(): value.encode() for name, value in headers.items()},
+            "cookies": {name.lower(): value.encode() for name, value in cookies.items()},
+            "generator": "\n".join(generators).encode(),
+            "scripts": "\n".join(scripts).encode(),
+            "html": body,
+        }
+        found = set()
+        for technology, field, name, regex in self.patterns:
+            text = texts[field].get(name) if name is not None else texts[field]
+            if text is not None and regex.search(text):
+                found.add(technology)
+        return found
+
+
+def per_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    print(f"{'signatures':>10}  {'body size':>9}  {'build (ms)':>10}  {'naive (us)':>11}  {'index (us)':>11}  found")
+    for total in (len(TECHNOLOGY_SIGNATURES), 1_000, 5_000, 10_000):
+        table = signatures(total)
+        started = time.perf_counter()
+        index = SignatureIndex(table)
+        build = (time.perf_counter() - started) * 1e3
+        naive = NaiveMatcher(table)
+        for size in (10_000, 100_000, 1_000_000):
+            response = make_response(size)
+            found = index.match(*response)
+            if total * size <= MAX_NAIVE_WORK and {name for name, _, _ in found} != naive.match(*response):
+                raise AssertionError("the index and the naive matcher disagree")
+            index_us = per_call(lambda: index.match(*response), max(1, 20_000_000 // size))
+            if total * size <= MAX_NAIVE_WORK:
+                naive_us = f"{per_call(lambda: naive.match(*response), max(1, 20_000_000 // (total * size))):.1f}"
+            else:
+                naive_us = "-"
+            print(f"{total:>10}  {size:>9}  {build:>10.1f}  {naive_us:>11}  {index_us:>11.1f}  {len(found)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Time and peak memory of form extraction across page sizes.
+
+Compares two extractors on the same synthetic pages:
+  soup       BeautifulSoup(html.parser) + find_all("form") + form_details,
+             which is what get_forms did before
+  extractor  the incremental regex extractor in extractor.py
+
+Both must return identical form details. Peak memory is measured with
+tracemalloc and includes the parsed tree for the soup case.
+
+Usage: python benchmarks/bench_forms.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from extractor import extract_forms  # noqa: E402
+
+FORM = (b'<form action="/search" method="get"><input name="q" type="text">'
+        b'<select name="sort"><option>a</option></select><input type="submit" value="go"></form>\n')
+
+
+def form_details(form):
+    """Extract details of forms."""
+    details_of_form = {}
+    action = form.attrs.get("action")
+    method = form.attrs.get("method", "get").lower()
+    inputs = []
+
+    for input_tag in form.find_all(["input", "textarea", "select"]):
+        if input_tag.name == "input":
+            input_type = input_tag.attrs.get("type", "text")
+        else:
+            input_type = input_tag.name
+        input_name = input_tag.attrs.get("name")
+        input_value = input_tag.attrs.get("value", "")
+        inputs.append({
+            "type": input_type,
+            "name": input_name,
+            "value": input_value,
+        })
+
+    details_of_form['action'] = action
+    details_of_form['method'] = method
+    details_of_form['inputs'] = inputs
+    return details_of_form
+
+
+def soup_forms(body):
+    return [form_details(form) for form in BeautifulSoup(body, "html.parser").find_all("form")]
+
+
+def extractor_forms(body):
+    return extract_forms(body)[0]
+
+
+def make_page(size, forms=5):
+    """HTML-ish filler of roughly `size` bytes with forms spread through it."""
+    line = b'<div class="row"><p>Lorem ipsum <a href="/item">dolor</a> sit amet.</p></div>\n'
+    rows = max(forms, size // len(line))
+    step = rows // forms
+    parts = [b"<html><body>\n"]
+    for row in range(rows):
+        if row % step == 0:
+            parts.append(FORM)
+        parts.append(line)
+    parts.append(b"</body></html>\n")
+    return b"".join(parts)
+
+
+def measure(extract, body):
+    """Return (result, seconds, peak bytes) of one run."""
+    start = time.perf_counter()
+    result = extract(body)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    extract(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    print(f"{'page size':>10}  {'soup (ms)':>10}  {'soup peak':>10}  "
+          f"{'extractor (ms)':>15}  {'extractor peak':>15}")
+    for size in (10_000, 100_000, 1_000_000, 5_000_000):
+        body = make_page(size)
+        expected, soup_time, soup_peak = measure(soup_forms, body)
+        result, fast_time, fast_peak = measure(extractor_forms, body)
+        assert result == expected, "extractor and soup disagree"
+        print(f"{size:>10}  {soup_time * 1e3:>10.1f}  {soup_peak / 1e6:>8.1f}MB  "
+              f"{fast_time * 1e3:>15.1f}  {fast_peak / 1e6:>13.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Compare the old sequential port loop with the concurrent scan engine.
+
+Usage: python benchmarks/bench_portscan.py [--target HOST] [--ports N] [--filtered N]
+
+Against localhost the script opens a few listening ports and a few "filtered"
+ones (listeners whose accept backlog is full, so new SYNs are dropped and the
+connect hangs until the timeout, like a firewalled port).
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixture import open_filtered, open_listeners  # noqa: E402
+from portscan import scan_ports  # noqa: E402
+from resolver import resolve  # noqa: E402
+
+
+def sequential_scan(target, ports, timeout):
+    """The original one-socket-at-a-time loop."""
+    open_ports = []
+    for port in ports:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        if sock.connect_ex((target, port)) == 0:
+            open_ports.append(port)
+        sock.close()
+    return open_ports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="127.0.0.1")
+    parser.add_argument("--ports", type=int, default=1024)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--filtered", type=int, default=8)
+    args = parser.parse_args()
+
+    listeners, filtered, fillers = [], [], []
+    if args.target == "127.0.0.1":
+        listeners = open_listeners(3)
+        filtered, fillers = open_filtered(args.filtered)
+    extra_ports = {sock.getsockname()[1] for sock in listeners + filtered}
+    ports = list(range(1, args.ports + 1)) + sorted(extra_ports)
+
+    start = time.perf_counter()
+    expected = sequential_scan(args.target, ports, args.timeout)
+    sequential_time = time.perf_counter() - start
+
+    host_ip = resolve(args.target)[0]
+    start = time.perf_counter()
+    fixed = scan_ports(host_ip, ports, args.concurrency, args.timeout, adaptive=False)
+    fixed_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = scan_ports(host_ip, ports, args.concurrency, args.timeout)
+    concurrent_time = time.perf_counter() - start
+
+    for sock in listeners + filtered + fillers:
+        sock.close()
+
+    print(f"ports scanned:   {len(ports)}")
+    print(f"open ports:      {found}")
+    print(f"results match:   {sorted(expected) == fixed == found}")
+    print(f"sequential:      {sequential_time:.3f}s")
+    print(f"fixed timeout:   {fixed_time:.3f}s")
+    print(f"adaptive:        {concurrent_time:.3f}s")
+    print(f"speedup:         {sequential_time / max(concurrent_time, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Time and peak memory of sitemap parsing as sitemaps grow.
+
+Compares two parsers on the same synthetic urlsets, plain and gzipped:
+  tree       read the whole body (gunzipping it first) and parse it with
+             ElementTree.fromstring
+  streaming  seeds.SitemapParser fed 64 KiB chunks, as seed_urls does
+
+Both must find the same URLs. Peak memory is measured with tracemalloc
+and includes the list of URLs found; for the tree case it also includes
+the whole body and its tree, while the streaming parser holds one chunk.
+
+Usage: python benchmarks/bench_sitemaps.py
+"""
+import gzip
+import os
+import sys
+import time
+import tracemalloc
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetch import BODY_CHUNK_SIZE  # noqa: E402
+from seeds import SitemapParser  # noqa: E402
+
+NAMESPACE = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+def make_sitemap(count):
+    entries = "".join(f"<url><loc>https://example.test/products/{i}?ref=sitemap</loc>"
+                      f"<lastmod>2024-05-01</lastmod><changefreq>weekly</changefreq></url>\n" for i in range(count))
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{NAMESPACE[1:-1]}">\n'
+            f"{entries}</urlset>\n").encode()
+
+
+def chunks(body):
+    """The body as the network would hand it over."""
+    for start in range(0, len(body), BODY_CHUNK_SIZE):
+        yield body[start:start + BODY_CHUNK_SIZE]
+
+
+def tree_urls(body):
+    data = b"".join(chunks(body))
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    return [loc.text for loc in ElementTree.fromstring(data).iter(f"{NAMESPACE}loc")]
+
+
+def streaming_urls(body):
+    parser = SitemapParser()
+    urls = []
+    for chunk in chunks(body):
+        urls.extend(url for _, url in parser.feed(chunk))
+    urls.extend(url for _, url in parser.close())
+    return urls
+
+
+def measure(parse, body):
+    """Return (result, seconds, peak bytes) of one run; the body is generated outside the measurement."""
+    start = time.perf_counter()
+    result = parse(body)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    parse(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    print(f"{'urls':>7}  {'format':>6}  {'tree (ms)':>10}  {'tree peak':>10}  "
+          f"{'streaming (ms)':>15}  {'streaming peak':>15}")
+    for count in (1_000, 10_000, 50_000):
+        plain = make_sitemap(count)
+        for name, body in (("xml", plain), ("gzip", gzip.compress(plain))):
+            expected, tree_time, tree_peak = measure(tree_urls, body)
+            result, stream_time, stream_peak = measure(streaming_urls, body)
+            assert result == expected, "the parsers disagree"
+            print(f"{count:>7}  {name:>6}  {tree_time * 1e3:>10.1f}  {tree_peak / 1e6:>8.1f}MB  "
+                  f"{stream_time * 1e3:>15.1f}  {stream_peak / 1e6:>13.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Cost per response of the SQL error matcher across body sizes.
+
+Compares three matchers:
+  old        the previous check: decode and lowercase the body once per
+             error string, three strings only
+  naive      one case-insensitive regex search per signature, i.e. the old
+             approach extended to the full signature table
+  matcher    the precompiled hub-word matcher in sql_errors.py
+
+Usage: python benchmarks/bench_sql_errors.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sql_errors import SQL_ERROR_SIGNATURES, match_sql_error  # noqa: E402
+
+OLD_ERRORS = {
+    "quoted string not properly terminated",
+    "unclosed quotation mark after the character string",
+    "you have an error in your SQL syntax",
+}
+
+
+def old_vulnerable(content):
+    """The previous substring check."""
+    for error in OLD_ERRORS:
+        if error in content.decode().lower():
+            return True
+    return False
+
+
+NAIVE_PATTERNS = [
+    (dbms, re.compile(pattern.encode(), re.IGNORECASE))
+    for dbms, patterns in SQL_ERROR_SIGNATURES.items()
+    for pattern in patterns
+]
+
+
+def naive_match(content):
+    """One regex search per signature."""
+    for dbms, pattern in NAIVE_PATTERNS:
+        if pattern.search(content):
+            return dbms
+    return None
+
+
+def make_body(size, error=b""):
+    """HTML-ish filler of roughly `size` bytes with error at the end."""
+    line = b"<div class=\"row\"><p>Lorem ipsum dolor sit amet, consectetur.</p></div>\n"
+    return line * (size // len(line)) + error
+
+
+def main():
+    print(f"{len(NAIVE_PATTERNS)} signatures")
+    print(f"{'body size':>10}  {'case':>6}  {'old (us)':>10}  {'naive (us)':>11}  {'matcher (us)':>13}")
+    for size in (1_000, 10_000, 100_000, 1_000_000, 5_000_000):
+        for case, error in (("clean", b""), ("error", b"You have an error in your SQL syntax")):
+            body = make_body(size, error)
+            timings = []
+            for check in (old_vulnerable, naive_match, match_sql_error):
+                number = max(1, (200_000 if check is naive_match else 2_000_000) // size)
+                timings.append(min(timeit.repeat(lambda: check(body), number=number, repeat=3)) / number * 1e6)
+            old, naive, new = timings
+            print(f"{size:>10}  {case:>6}  {old:>10.1f}  {naive:>11.1f}  {new:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""A local stand-in target for the benchmarks.
+
+Serves an HTTP site on 127.0.0.1 and holds open, closed and filtered TCP
+ports on the same address:
+
+  /                 landing page with forms, links to every other page,
+                    a Server header, X-Powered-By and a cookie
+  /page/N           crawlable pages, each with its own forms plus a shared
+                    search form
+  /query/N          form targets; even N answer a quote in any parameter
+                    with a MySQL error page. With --blind, N = 1 mod 4 is
+                    boolean-blind and N = 3 mod 4 time-blind injectable
+  /slow             answers after --slow seconds
+  /large            a --large byte HTML body
+  /robots.txt       a few Disallow lines and a Sitemap line
+  /sitemap.xml      sitemap index naming /sitemap-pages.xml.gz
+  /sitemap-pages.xml.gz
+                    gzipped sitemap listing every page
+  /_stats           JSON request count, not counted itself
+
+Filtered ports are listeners whose accept backlog is full, so new SYNs
+are dropped and connects hang until they time out.
+
+Usage: python benchmarks/fixture.py [--pages N] [--forms N] ...
+Prints one JSON line describing the target, then serves until killed.
+"""
+import argparse
+import gzip
+import http.server
+import json
+import re
+import socket
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+SQL_ERROR = b"<html><body>You have an error in your SQL syntax; check the manual</body></html>"
+QUERY_FAILED = b"<html><body>Sorry, something went wrong.</body></html>"
+ROWS = b"<html><body><ul><li>Widget</li><li>Gadget</li><li>Gizmo</li></ul></body></html>"
+NO_ROWS = b"<html><body>No results.</body></html>"
+# What a blind form's value looks like inside the fixture's pretend query
+BOOLEAN_CONDITION = re.compile(r"' AND '(\w*)'='(\w*)$")
+SLEEP_CALL = re.compile(r"SLEEP\((\d+)\)")
+FILLER = b'<div class="row"><p>Lorem ipsum dolor sit amet, consectetur.</p></div>\n'
+
+
+def open_listeners(count):
+    """Open a few listening sockets on localhost and return them."""
+    listeners = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(16)
+        listeners.append(sock)
+    return listeners
+
+
+def open_filtered(count):
+    """Open listeners with a full backlog so connects to them hang.
+
+    Returns the listening sockets and the filler connections separately.
+    """
+    sockets, fillers = [], []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        sock.listen(0)
+        sockets.append(sock)
+        # Fill the accept queue so further SYNs are dropped
+        for _ in range(2):
+            filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            filler.setblocking(False)
+            filler.connect_ex(sock.getsockname())
+            fillers.append(filler)
+    time.sleep(0.1)
+    return sockets, fillers
+
+
+def closed_ports(count):
+    """Ports that were free a moment ago, so connects to them are refused."""
+    ports = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(("127.0.0.1", 0))
+        ports.append(sock.getsockname()[1])
+        sock.close()
+    return ports
+
+
+def _form(action, method, fields):
+    inputs = "".join(f'<input name="{field}" type="text">' for field in fields)
+    return f'<form action="{action}" method="{method}">{inputs}<input type="submit" value="go"></form>\n'
+
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    """Routes for the fixture site; settings live on the server."""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, status=200, headers=(), content_type=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type or ("text/plain" if self.path.endswith(".txt") else "text/html"))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # Clients stop reading large bodies at their byte cap
+            pass
+
+    def _page(self, index):
+        server = self.server
+        links = "".join(f'<a href="/page/{i}">page {i}</a>\n' for i in range(server.pages))
+        forms = [_form("/search", "get", ["q"])]
+        for j in range(server.forms):
+            number = index * server.forms + j
+            forms.append(_form(f"/query/{number}", "post" if number % 3 else "get", [f"field{number}", "name"]))
+        return f"<html><head><title>Page {index}</title></head><body>\n{links}" \
+               f'<a href="/slow">slow</a> <a href="/large">large</a>\n{"".join(forms)}</body></html>'.encode()
+
+    def _absolute(self, path):
+        return f"http://{self.headers.get('Host')}{path}".encode()
+
+    def _blind_query(self, number, values):
+        """Answer as if each value went into WHERE name = '...' without escaping, hiding errors."""
+        rows = True
+        for value in values:
+            if value.count("'") % 2:
+                return QUERY_FAILED
+            if number % 4 == 3:
+                sleep = SLEEP_CALL.search(value)
+                if sleep:
+                    time.sleep(min(int(sleep.group(1)), 10))
+                continue
+            condition = BOOLEAN_CONDITION.search(value)
+            if condition:
+                rows = rows and condition.group(1) == condition.group(2)
+            elif '"' in value:
+                rows = False
+        return ROWS if rows else NO_ROWS
+
+    def _count(self):
+        with self.server.lock:
+            self.server.requests += 1
+
+    def _handle(self, params):
+        path = urlsplit(self.path).path
+        if path == "/_stats":
+            return self._send(json.dumps({"requests": self.server.requests}).encode())
+        self._count()
+        if path == "/":
+            return self._send(self._page(0), headers=[
+                ("Server", "nginx/1.18.0"), ("X-Powered-By", "PHP/7.4"), ("Set-Cookie", "session=abc; Path=/"),
+            ])
+        if path.startswith("/page/") and path[6:].isdigit():
+            return self._send(self._page(int(path[6:])))
+        if path.startswith("/query/") and path[7:].isdigit():
+            quoted = any("'" in value or '"' in value for values in params.values() for value in values)
+            if quoted and int(path[7:]) % 2 == 0:
+                return self._send(SQL_ERROR)
+            if self.server.blind and int(path[7:]) % 2 == 1:
+                return self._send(self._blind_query(int(path[7:]), [value for values in params.values()
+                                                                     for value in values]))
+            return self._send(NO_ROWS)
+        if path == "/search":
+            return self._send(b"<html><body>No results.</body></html>")
+        if path == "/slow":
+            time.sleep(self.server.slow)
+            return self._send(self._page(0))
+        if path == "/large":
+            return self._send(FILLER * (self.server.large // len(FILLER)))
+        if path == "/robots.txt":
+            return self._send(b"User-agent: *\nDisallow: /admin\nDisallow: /private\n"
+                              b"Sitemap: " + self._absolute("/sitemap.xml") + b"\n")
+        if path == "/sitemap.xml":
+            return self._send(b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                              b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                              b"<sitemap><loc>" + self._absolute("/sitemap-pages.xml.gz") + b"</loc></sitemap>"
+                              b"</sitemapindex>", content_type="application/xml")
+        if path == "/sitemap-pages.xml.gz":
+            urls = b"".join(b"<url><loc>" + self._absolute(f"/page/{i}") + b"</loc></url>"
+                            for i in range(self.server.pages))
+            return self._send(gzip.compress(b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                                            b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                                            + urls + b"</urlset>"), content_type="application/gzip")
+        return self._send(b"<html><body>Not found</body></html>", status=404)
+
+    def do_GET(self):
+        self._handle(parse_qs(urlsplit(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self._handle(parse_qs(self.rfile.read(length).decode("utf-8", "replace")))
+
+
+class FixtureTarget:
+    """The fixture site and ports, running in background threads until closed."""
+
+    def __init__(self, pages=20, forms=3, slow=0.5, large=5 * 1024 * 1024, open=3, closed=8, filtered=4,
+                 blind=False):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        self.server.daemon_threads = True
+        self.server.pages = pages
+        self.server.forms = forms
+        self.server.slow = slow
+        self.server.large = large
+        self.server.blind = blind
+        self.server.requests = 0
+        self.server.lock = threading.Lock()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+        self._listeners = open_listeners(open)
+        self._filtered, self._fillers = open_filtered(filtered)
+        self.open_ports = sorted([self.server.server_address[1]] + [s.getsockname()[1] for s in self._listeners])
+        self.closed_ports = closed_ports(closed)
+        self.filtered_ports = sorted(s.getsockname()[1] for s in self._filtered)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def ports(self):
+        return sorted(self.open_ports + self.closed_ports + self.filtered_ports)
+
+    def describe(self):
+        return {
+            "url": self.url,
+            "open_ports": self.open_ports,
+            "closed_ports": self.closed_ports,
+            "filtered_ports": self.filtered_ports,
+        }
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        for sock in self._listeners + self._filtered + self._fillers:
+            sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20, help="crawlable pages")
+    parser.add_argument("--forms", type=int, default=3, help="forms per page, besides the shared search form")
+    parser.add_argument("--slow", type=float, default=0.5, help="seconds /slow takes to answer")
+    parser.add_argument("--large", type=int, default=5 * 1024 * 1024, help="bytes in /large")
+    parser.add_argument("--open", type=int, default=3, help="extra open ports")
+    parser.add_argument("--closed", type=int, default=8, help="closed ports")
+    parser.add_argument("--filtered", type=int, default=4, help="filtered ports")
+    parser.add_argument("--blind", action="store_true", help="make some form targets blind-injectable")
+    args = parser.parse_args()
+
+    target = FixtureTarget(args.pages, args.forms, args.slow, args.large, args.open, args.closed, args.filtered,
+                           args.blind)
+    print(json.dumps(target.describe()), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        target.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""Run every check and the full /scan pipeline against a local fixture target.
+
+Starts benchmarks/fixture.py in a subprocess, runs each benchmark
+--repeat times and reports the median wall time, the requests the
+fixture served per second, and the peak Python memory of one extra
+traced run. Every run starts from an empty result cache, so rescans and
+cached results do not hide the work.
+
+Results are written as JSON to --output. With --baseline, they are
+compared with an earlier results file, and the exit status is 1 if any
+benchmark got slower by more than --tolerance and --min-delta seconds.
+
+Usage: python benchmarks/suite.py [--repeat N] [--output FILE] [--baseline FILE]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import app  # noqa: E402
+import ratelimit  # noqa: E402
+from cache import ResultCache  # noqa: E402
+from fetch import fetch_page  # noqa: E402
+from rescan import PageStore, ScanHistory  # noqa: E402
+from sqli import BaselineStore  # noqa: E402
+
+# Seconds to wait for a /scan job before giving up on it
+SCAN_TIMEOUT = 300
+
+
+def start_fixture(args):
+    """Start the fixture target and return (process, description)."""
+    command = [sys.executable, os.path.join(HERE, "fixture.py"), "--pages", str(args.pages),
+               "--forms", str(args.forms), "--slow", str(args.slow), "--large", str(args.large)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    return process, json.loads(process.stdout.readline())
+
+
+def served(target):
+    """Requests the fixture has answered so far."""
+    with urllib.request.urlopen(target["url"] + "_stats") as response:
+        return json.load(response)["requests"]
+
+
+def reset_state():
+    """Give the app an empty result cache, rescan history and SQL injection baselines."""
+    app.result_cache = ResultCache(app.RESULT_CACHE_BYTES)
+    app.page_store = PageStore(app.result_cache)
+    app.scan_history = ScanHistory(app.result_cache)
+    app.baseline_store = BaselineStore(app.result_cache)
+
+
+def full_scan(target):
+    """POST /scan and wait for the job to finish."""
+    client = app.app.test_client()
+    ports = ",".join(map(str, target["ports"]))
+    response = client.post("/scan", data={"url": target["url"], "ports": ports},
+                           headers={"Accept": "application/json"})
+    status_url = response.get_json()["status_url"]
+    deadline = time.monotonic() + SCAN_TIMEOUT
+    while time.monotonic() < deadline:
+        job = client.get(status_url).get_json()
+        if job["status"] == "done":
+            return job["results"]
+        time.sleep(0.05)
+    raise RuntimeError("scan did not finish")
+
+
+def benchmarks(target):
+    """(name, function) pairs; each function runs one benchmark once."""
+    url = target["url"]
+    ports = target["ports"]
+    return [
+        ("sql injection scan", lambda: app.sql_injection_scan(url)),
+        ("open port scan", lambda: app.open_port_scan("127.0.0.1", ports)),
+        ("host details", lambda: app.get_host_details("127.0.0.1")),
+        ("robots txt", lambda: app.check_robots_txt(url)),
+        ("technology details", lambda: app.get_technology_details(url)),
+        ("security headers", lambda: app.check_security_headers(url)),
+        ("cookies", lambda: app.check_cookies(url)),
+        ("fetch slow page", lambda: fetch_page(url + "slow", app.s).content),
+        ("fetch large page", lambda: fetch_page(url + "large", app.s).content),
+        ("full scan", lambda: full_scan(target)),
+    ]
+
+
+def measure(target, func, repeat):
+    """Median wall time, requests per second and peak memory of func."""
+    times = []
+    requests = 0
+    for _ in range(repeat):
+        reset_state()
+        before = served(target)
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+        requests = served(target) - before
+
+    reset_state()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median = statistics.median(times)
+    return {
+        "wall_seconds": round(median, 4),
+        "min_seconds": round(min(times), 4),
+        "max_seconds": round(max(times), 4),
+        "requests": requests,
+        "requests_per_second": round(requests / median, 1) if median else None,
+        "peak_memory_bytes": peak,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=HERE, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance, min_delta):
+    """Print changes against a baseline file and return the names that regressed.
+
+    A benchmark regressed if it is slower by more than tolerance and by at
+    least min_delta seconds, so millisecond jitter is not flagged.
+    """
+    with open(baseline_path) as file:
+        baseline = json.load(file)["results"]
+    regressed = []
+    print(f"\ncompared with {baseline_path}:")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["wall_seconds"], result["wall_seconds"]
+        change = (after - before) / before if before else 0
+        marker = ""
+        if change > tolerance and after - before >= min_delta:
+            marker = "  REGRESSION"
+            regressed.append(name)
+        print(f"  {name:<20} {before:>9.3f}s -> {after:>9.3f}s  {change:+.0%}{marker}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="seconds of slowdown ignored as noise")
+    parser.add_argument("--only", action="append", help="run only this benchmark; may be repeated")
+    parser.add_argument("--unpaced", action="store_true", help="lift the per-host rate limits")
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--forms", type=int, default=3)
+    parser.add_argument("--slow", type=float, default=0.5)
+    parser.add_argument("--large", type=int, default=5 * 1024 * 1024)
+    args = parser.parse_args()
+
+    if args.unpaced:
+        for limits in ratelimit.LIMITS.values():
+            limits.update(rate=1e9, burst=1e9, initial=limits["maximum"])
+
+    process, target = start_fixture(args)
+    target["ports"] = sorted(target["open_ports"] + target["closed_ports"] + target["filtered_ports"])
+    results = {}
+    try:
+        print(f"{'benchmark':<20} {'wall (s)':>9} {'requests':>9} {'req/s':>8} {'peak MB':>8}")
+        for name, func in benchmarks(target):
+            if args.only and name not in args.only:
+                continue
+            result = results[name] = measure(target, func, args.repeat)
+            print(f"{name:<20} {result['wall_seconds']:>9.3f} {result['requests']:>9} "
+                  f"{result['requests_per_second'] or 0:>8.1f} {result['peak_memory_bytes'] / 1e6:>8.1f}")
+    finally:
+        process.terminate()
+        process.wait()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items()
+                     if key not in ("output", "baseline", "tolerance", "min_delta")},
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.baseline and compare(results, args.baseline, args.tolerance, args.min_delta):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Per-scan limits on wall-clock time, outbound requests and bytes read.
+
+One ScanBudget is shared by all the checks of a scan. run_checks hands it
+to each check through the check's metrics.Scope, so it follows the check
+onto crawl and injection pools and into its event loops. Every HTTP
+request is charged to it, as is every body byte read. TCP connects for
+port and banner probes have an allowance of their own, so a large port
+profile cannot use up the requests of the other checks.
+
+Once a limit is reached the budget is spent and checks stop cooperatively:
+further HTTP requests raise BudgetExhausted, and port and banner probes are
+skipped. Running out of connects only stops the probes. HTTP timeouts are
+cut down to the time left, so a request in flight when the time runs out
+ends with it. run_checks marks what the interrupted checks had found so
+far as partial, and reports checks that do not wrap up in time as stopped.
+"""
+import threading
+import time
+
+from metrics import current_scope
+
+# Default limits for one scan; None means unlimited
+SCAN_MAX_SECONDS = 300
+SCAN_MAX_REQUESTS = 5000
+SCAN_MAX_BYTES = 64 * 1024 * 1024
+# TCP connects, enough for the "full" port profile plus banner grabs
+SCAN_MAX_CONNECTS = 70000
+# Seconds checks get to return what they have once the budget is spent
+STOP_GRACE_SECONDS = 5
+# Shortest timeout a request is given when little time is left, in seconds
+MIN_REQUEST_TIMEOUT = 0.1
+
+
+class BudgetExhausted(Exception):
+    """Raised instead of sending a request once the scan's budget is spent."""
+
+    def __init__(self, reason):
+        super().__init__(f"The scan's {reason} budget ran out")
+        self.reason = reason
+
+
+class ScanBudget:
+    """Time, request and byte allowance of one scan, safe to share between threads."""
+
+    def __init__(self, seconds=SCAN_MAX_SECONDS, requests=SCAN_MAX_REQUESTS, max_bytes=SCAN_MAX_BYTES,
+                 connects=SCAN_MAX_CONNECTS):
+        self.max_seconds = seconds
+        self.max_requests = requests
+        self.max_bytes = max_bytes
+        self.max_connects = connects
+        # The clock starts when the scan does, not when it is queued
+        self.started = None
+        self.requests = 0
+        self.bytes = 0
+        self.connects = 0
+        # Whether a connect was refused; this does not spend the budget
+        self.connects_spent = False
+        # Which limit ran out ("time", "request" or "byte") and when
+        self.reason = None
+        self.spent_at = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the clock, unless it is already running."""
+        with self._lock:
+            if self.started is None:
+                self.started = time.monotonic()
+
+    @property
+    def deadline(self):
+        """time.monotonic() value at which the time budget runs out, or None."""
+        if self.max_seconds is None or self.started is None:
+            return None
+        return self.started + self.max_seconds
+
+    def remaining(self):
+        """Seconds left in the time budget, or None without a time limit or before the clock starts."""
+        deadline = self.deadline
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def _spend(self, reason):
+        if self.reason is None:
+            self.reason = reason
+            self.spent_at = time.monotonic()
+
+    def exhausted(self):
+        """The limit that ran out, or None while the budget lasts."""
+        with self._lock:
+            if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+                self._spend("time")
+            return self.reason
+
+    def take_request(self):
+        """Count one outbound request or connect; False, and nothing counted, if the budget is spent."""
+        if self.exhausted() is not None:
+            return False
+        with self._lock:
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                self._spend("request")
+                return False
+            self.requests += 1
+            return True
+
+    def take_connect(self):
+        """Count one TCP connect; False, and nothing counted, if connects or the budget are spent."""
+        if self.exhausted() is not None:
+            return False
+        with self._lock:
+            if self.max_connects is not None and self.connects >= self.max_connects:
+                self.connects_spent = True
+                return False
+            self.connects += 1
+            return True
+
+    def add_bytes(self, size):
+        with self._lock:
+            self.bytes += size
+            if self.max_bytes is not None and self.bytes >= self.max_bytes:
+                self._spend("byte")
+
+    def to_dict(self):
+        return {
+            "seconds": 0 if self.started is None else round(time.monotonic() - self.started, 3),
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "connects": self.connects,
+            "limits": {"seconds": self.max_seconds, "requests": self.max_requests, "bytes": self.max_bytes,
+                       "connects": self.max_connects},
+            "exhausted": self.reason,
+        }
+
+
+def _past_deadline(scope):
+    return scope.deadline is not None and time.monotonic() >= scope.deadline
+
+
+def allow_request():
+    """Charge one HTTP request to the current scan's budget; False if it is spent.
+
+    A check past its deadline is refused too, so that work it left queued
+    on a shared pool does not run on after it was given up. A refusal is
+    counted on the check's scope, which marks its result partial. Always
+    True outside a check.
+    """
+    scope = current_scope()
+    if scope is None or (not _past_deadline(scope) and (scope.budget is None or scope.budget.take_request())):
+        return True
+    scope.add(denied=1)
+    return False
+
+
+def allow_connect():
+    """Charge one TCP connect to the current scan's connect allowance; False if it is spent.
+
+    Refusals are counted on the check's scope like allow_request's.
+    """
+    scope = current_scope()
+    if scope is None or scope.budget is None or scope.budget.take_connect():
+        return True
+    scope.add(denied=1)
+    return False
+
+
+def charge_request():
+    """Like allow_request, but raise BudgetExhausted if the budget is spent."""
+    if not allow_request():
+        raise BudgetExhausted(exhausted())
+
+
+def time_left():
+    """Seconds until the current check's deadline or its scan's time budget, whichever is sooner, or None."""
+    scope = current_scope()
+    if scope is None:
+        return None
+    limits = [] if scope.deadline is None else [scope.deadline - time.monotonic()]
+    if scope.budget is not None and scope.budget.remaining() is not None:
+        limits.append(scope.budget.remaining())
+    return min(limits, default=None)
+
+
+def request_timeout(timeout):
+    """timeout, in seconds or a (connect, read) pair, cut down to time_left().
+
+    An in-flight request then ends when its check or scan runs out of time,
+    instead of holding the check past it.
+    """
+    left = time_left()
+    if left is None:
+        return timeout
+    left = max(left, MIN_REQUEST_TIMEOUT)
+    if isinstance(timeout, tuple):
+        return tuple(left if part is None else min(part, left) for part in timeout)
+    return left if timeout is None else min(timeout, left)
+
+
+def cut_off():
+    """Count a request that timed out because its check or scan ran out of time as refused.
+
+    Returns whether it did; such a timeout says nothing about the host.
+    """
+    scope = current_scope()
+    if scope is None or exhausted() is None:
+        return False
+    scope.add(denied=1)
+    return True
+
+
+def exhausted():
+    """The limit of the current scan's budget that ran out, "time" once the check is past its deadline, or None."""
+    scope = current_scope()
+    if scope is None:
+        return None
+    if scope.budget is not None and scope.budget.exhausted() is not None:
+        return scope.budget.reason
+    return "time" if _past_deadline(scope) else None
@@ -0,0 +1,267 @@
+"""Bulk scanning of many targets across a pool of worker processes.
+
+The coordinator streams targets to worker processes, each of which runs
+several scans at once on the async engine (or on threads without
+aiohttp), and appends every finished scan to a JSON Lines
+file as soon as it arrives, so memory stays flat however many targets
+there are. A global cap bounds the scans in flight and a per-host cap
+keeps any one host from being scanned too many times at once.
+"""
+import json
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from budget import ScanBudget
+from findings import Problem, dump
+
+BULK_PROCESSES = os.cpu_count() or 2
+SCANS_PER_PROCESS = 4
+PER_HOST_CONCURRENCY = 2
+# Seconds between throughput reports
+PROGRESS_INTERVAL = 10
+# Where runs started from the API write their results
+BULK_OUTPUT_DIR = os.path.join(tempfile.gettempdir(), "shield-webscan-bulk")
+
+_runs = {}
+_runs_lock = threading.Lock()
+
+
+def read_targets(lines):
+    """Yield target URLs from lines of text, skipping blanks and # comments."""
+    for line in lines:
+        target = line.strip()
+        if not target or target.startswith("#"):
+            continue
+        if "://" not in target:
+            target = f"http://{target}"
+        yield target
+
+
+def _host(url):
+    return urlsplit(url).hostname or url
+
+
+def _result(url, started, budget, results):
+    # Plain dicts are cheaper to send back to the parent than records
+    return {"url": url, "results": {name: dump(result) for name, result in results.items()},
+            "seconds": round(time.monotonic() - started, 3), "partial": budget.reason}
+
+
+def _scan(url):
+    """Run every check against url on threads inside a worker process."""
+    from app import build_checks
+    from scheduler import run_checks
+
+    started = time.monotonic()
+    budget = ScanBudget()
+    try:
+        results = run_checks(build_checks(url), budget=budget)
+    except Exception as e:
+        results = {"error": [Problem(f"Error scanning target: {str(e)}")]}
+    return _result(url, started, budget, results)
+
+
+async def _scan_async(url):
+    """Run every check against url on the worker's async engine loop."""
+    from app import run_scan_async
+
+    started = time.monotonic()
+    budget = ScanBudget()
+    try:
+        results = await run_scan_async(url, budget=budget)
+    except Exception as e:
+        results = {"error": [Problem(f"Error scanning target: {str(e)}")]}
+    return _result(url, started, budget, results)
+
+
+def _worker(index, tasks, done, scans):
+    """Worker process: run up to `scans` targets from tasks at once.
+
+    The scans share one event loop and connection pool when aiohttp is
+    installed, and fall back to a thread each otherwise.
+    """
+    from aiofetch import AVAILABLE, submit
+
+    slots = threading.Semaphore(scans)
+    pool = None if AVAILABLE else ThreadPoolExecutor(max_workers=scans)
+
+    def finished(future):
+        done.put((index, future.result()))
+        slots.release()
+
+    try:
+        while True:
+            slots.acquire()
+            url = tasks.get()
+            if url is None:
+                return
+            future = submit(_scan_async(url)) if pool is None else pool.submit(_scan, url)
+            future.add_done_callback(finished)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+class BulkRun:
+    """Progress of one bulk scan."""
+
+    def __init__(self, output):
+        self.id = uuid.uuid4().hex
+        self.output = output
+        self.started = time.monotonic()
+        self.completed = 0
+        self.finished = False
+        self.error = None
+
+    @property
+    def rate(self):
+        """Targets scanned per minute so far."""
+        elapsed = time.monotonic() - self.started
+        return self.completed / elapsed * 60 if elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            "run_id": self.id,
+            "completed": self.completed,
+            "targets_per_minute": round(self.rate, 1),
+            "finished": self.finished,
+            "error": self.error,
+        }
+
+
+def _next_target(targets, deferred, in_flight, per_host, max_deferred):
+    """Pick the next target whose host is below its cap, or None."""
+    for _ in range(len(deferred)):
+        url = deferred.popleft()
+        if in_flight[_host(url)] < per_host:
+            return url
+        deferred.append(url)
+    while len(deferred) < max_deferred:
+        url = next(targets, None)
+        if url is None or in_flight[_host(url)] < per_host:
+            return url
+        deferred.append(url)
+    return None
+
+
+def _failed(url, reason):
+    return {"url": url, "results": {"error": dump([Problem(reason)])}, "seconds": None, "partial": None}
+
+
+def run_bulk(targets, output, processes=BULK_PROCESSES, scans_per_process=SCANS_PER_PROCESS,
+             per_host=PER_HOST_CONCURRENCY, progress=None, run=None):
+    """Scan every target and append one JSON line per result to output.
+
+    Each worker has a task queue of its own, so the coordinator knows which
+    targets a worker holds; if the worker dies they are written out as
+    errors. progress(run) is called every PROGRESS_INTERVAL seconds and at
+    the end.
+    """
+    run = run or BulkRun(output)
+    context = multiprocessing.get_context("spawn")
+    done = context.Queue()
+    queues = [context.Queue() for _ in range(processes)]
+    workers = [context.Process(target=_worker, args=(index, tasks, done, scans_per_process), daemon=True)
+               for index, tasks in enumerate(queues)]
+    for worker in workers:
+        worker.start()
+
+    global_cap = processes * scans_per_process
+    targets = iter(targets)
+    deferred = deque()
+    in_flight = Counter()
+    # Targets sent to each worker and not yet reported back
+    assigned = [[] for _ in workers]
+    last_report = time.monotonic()
+
+    def write(result):
+        in_flight[_host(result["url"])] -= 1
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        run.completed += 1
+
+    try:
+        with open(output, "a") as out:
+            while True:
+                alive = [index for index, worker in enumerate(workers) if worker.is_alive()]
+                for index, urls in enumerate(assigned):
+                    if urls and index not in alive:
+                        for url in urls:
+                            write(_failed(url, "Bulk scan worker exited during the scan"))
+                        urls.clear()
+                if not alive:
+                    raise RuntimeError("All bulk scan workers exited")
+
+                for index in alive:
+                    while len(assigned[index]) < scans_per_process:
+                        url = _next_target(targets, deferred, in_flight, per_host, global_cap * 8)
+                        if url is None:
+                            break
+                        queues[index].put(url)
+                        assigned[index].append(url)
+                        in_flight[_host(url)] += 1
+                if not any(assigned):
+                    break
+
+                try:
+                    index, result = done.get(timeout=PROGRESS_INTERVAL)
+                except queue.Empty:
+                    pass
+                else:
+                    # A late result from a worker already given up on was written as an error
+                    if result["url"] in assigned[index]:
+                        assigned[index].remove(result["url"])
+                        write(result)
+
+                if progress is not None and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    progress(run)
+                    last_report = time.monotonic()
+    except Exception as e:
+        run.error = str(e)
+        raise
+    finally:
+        run.finished = True
+        for tasks in queues:
+            tasks.put(None)
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+    if progress is not None:
+        progress(run)
+    return run
+
+
+def start_bulk(targets):
+    """Run a bulk scan in the background and return its BulkRun."""
+    os.makedirs(BULK_OUTPUT_DIR, exist_ok=True)
+    run = BulkRun(None)
+    run.output = os.path.join(BULK_OUTPUT_DIR, f"{run.id}.jsonl")
+    # Created now so the results can be fetched before the first one lands
+    open(run.output, "a").close()
+    with _runs_lock:
+        _runs[run.id] = run
+
+    def background():
+        try:
+            run_bulk(targets, run.output, run=run)
+        except Exception:
+            pass  # recorded on run.error
+
+    threading.Thread(target=background, name=f"bulk-{run.id}", daemon=True).start()
+    return run
+
+
+def get_run(run_id):
+    """Return the bulk run with this ID, or None."""
+    with _runs_lock:
+        return _runs.get(run_id)
@@ -0,0 +1,91 @@
+"""TTL cache for check results: an in-memory LRU tier and an optional SQLite tier.
+
+Entries outlive their TTL by STALE_GRACE seconds so a stale result can be
+shown straight away while the check runs again to refresh it.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds an expired entry is still served as stale
+STALE_GRACE = 24 * 3600
+
+
+class CacheEntry:
+    """A cached value and when it was stored."""
+
+    def __init__(self, value, stored_at, expires_at):
+        self.value = value
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self):
+        return time.time() < self.expires_at
+
+    @property
+    def age(self):
+        return time.time() - self.stored_at
+
+
+class ResultCache:
+    """LRU cache of JSON-serializable values, bounded by total size in bytes.
+
+    With db_path set, entries are also written to a SQLite file, which is
+    consulted on a memory miss and survives restarts.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, db_path=None):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT, stored_at REAL, expires_at REAL)")
+            self._db.execute("DELETE FROM results WHERE expires_at < ?", (time.time() - STALE_GRACE,))
+
+    def _remember(self, key, data, stored_at, expires_at):
+        """Put serialized data in the memory tier, evicting as needed."""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old[0])
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = (data, stored_at, expires_at)
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, (evicted, _, _) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get(self, key):
+        """Return the CacheEntry for key, fresh or stale, or None."""
+        with self._lock:
+            row = self._entries.get(key)
+            if row is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, stored_at, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._remember(key, *row)
+        if row is None or row[2] + STALE_GRACE < time.time():
+            return None
+        data, stored_at, expires_at = row
+        return CacheEntry(json.loads(data), stored_at, expires_at)
+
+    def set(self, key, value, ttl):
+        """Store value under key for ttl seconds."""
+        data = json.dumps(value)
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, data, stored_at, stored_at + ttl)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                 (key, data, stored_at, stored_at + ttl))
@@ -0,0 +1,214 @@
+"""Same-origin site crawler that feeds discovered pages to the form checks."""
+import asyncio
+import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+from aiofetch import fetch_page_async
+from budget import exhausted
+from fetch import fetch_page
+from metrics import carry
+
+# Links to files we never expect to contain forms
+SKIPPED_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".ico", ".webp", ".css", ".js",
+    ".pdf", ".zip", ".gz", ".tar", ".mp3", ".mp4", ".avi", ".woff", ".woff2", ".ttf",
+)
+
+
+class BloomFilter:
+    """Fixed-size probabilistic set used for the crawler's visited URLs.
+
+    Membership tests can give false positives at roughly `error_rate`, which
+    only means a page is occasionally skipped; there are no false negatives.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+
+def normalize_url(url):
+    """Canonical form of url used for deduplication."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and (scheme, port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def _origin(url):
+    parts = urlsplit(normalize_url(url))
+    return parts.scheme, parts.netloc
+
+
+def _load(page):
+    """Fetch a page, returning None if the request failed."""
+    try:
+        page.response
+    except Exception:
+        return None
+    return page
+
+
+def _is_html(page):
+    content_type = page.headers.get("Content-Type", "")
+    return page.status_code == 200 and (not content_type or "html" in content_type)
+
+
+def _check_unchanged(page, page_store):
+    """Mark page unchanged if it is a 304 or its body hashes the same as last time."""
+    page.previous = page_store.get(page.url)
+    if page.previous is None:
+        return
+    if page.status_code == 304 or (page.status_code == 200 and page.content_hash == page.previous.get("hash")):
+        page.unchanged = True
+        page.links = page.previous.get("links", [])
+
+
+def _links(page):
+    """Absolute, normalized URLs of every <a href> on the page."""
+    for href in page.hrefs:
+        link = urljoin(page.url, href.strip())
+        if urlsplit(link).scheme in ("http", "https"):
+            yield normalize_url(link)
+
+
+class _Frontier:
+    """Crawl bookkeeping shared by crawl and crawl_async: what to yield and what to fetch next."""
+
+    def __init__(self, start_url, max_pages, page_store):
+        self.origin = _origin(start_url)
+        self.seen = BloomFilter(capacity=max(max_pages * 100, 1000))
+        self.seen.add(normalize_url(start_url))
+        self.budget = max_pages - 1
+        self.page_store = page_store
+        self.next_urls = []
+
+    def accept(self, page, depth):
+        """Prepare a fetched page and return True if it should be yielded."""
+        if self.page_store is not None:
+            _check_unchanged(page, self.page_store)
+        # The start page is always scanned, like the single-page check did
+        if not page.unchanged and depth > 0 and not _is_html(page):
+            return False
+        if page.links is None:
+            page.links = list(_links(page))
+        return True
+
+    def follow(self, page):
+        """Queue the page's unseen same-origin links while the page budget lasts."""
+        for link in page.links:
+            if self.budget <= 0:
+                break
+            self.queue(link)
+
+    def queue(self, url):
+        """Queue one normalized URL unless it is off-origin, seen already or not a page."""
+        if _origin(url) != self.origin or url in self.seen:
+            return
+        if urlsplit(url).path.lower().endswith(SKIPPED_EXTENSIONS):
+            return
+        self.seen.add(url)
+        self.next_urls.append(url)
+        self.budget -= 1
+
+    def advance(self):
+        """Return the URLs queued for the next depth level and start a new one."""
+        urls, self.next_urls = self.next_urls, []
+        return [(url, self.page_store.conditional_headers(url) if self.page_store else None) for url in urls]
+
+
+def crawl(start_url, session, start_page=None, max_depth=2, max_pages=30, concurrency=8, page_store=None,
+          seeds=None):
+    """Yield a PageContext for each same-origin HTML page reachable from start_url.
+
+    Pages are fetched breadth-first, one depth level at a time, with up to
+    `concurrency` requests in flight. At most `max_pages` pages are fetched,
+    including the start page, and links are followed `max_depth` levels deep.
+
+    seeds is an optional iterable of more URLs to crawl, such as
+    seeds.seed_urls. Once the start page's links are queued, it is drawn
+    on lazily for whatever page budget is left, and its pages are crawled
+    alongside the links at depth 1.
+
+    The crawl also stops after the current level once the scan's budget
+    is spent.
+
+    With a rescan.PageStore, pages are requested conditionally. Pages that
+    come back 304 or with the same body are yielded with `unchanged` set,
+    and their links are taken from the store. Every yielded page has its
+    links in `page.links`.
+    """
+    frontier = _Frontier(start_url, max_pages, page_store)
+    pages = [start_page or fetch_page(start_url, session)]
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="crawl") as pool:
+        for depth in range(max_depth + 1):
+            for page in pool.map(carry(_load), pages):
+                if page is None or not frontier.accept(page, depth):
+                    continue
+                yield page
+                if depth < max_depth:
+                    frontier.follow(page)
+            if depth == 0 and seeds is not None and max_depth > 0:
+                seeds = iter(seeds)
+                while frontier.budget > 0:
+                    url = next(seeds, None)
+                    if url is None:
+                        break
+                    frontier.queue(normalize_url(url))
+            pages = [fetch_page(url, session, headers) for url, headers in frontier.advance()]
+            if not pages or exhausted():
+                break
+
+
+async def crawl_async(start_url, client, start_page=None, max_depth=2, max_pages=30, concurrency=8,
+                      page_store=None, seeds=None):
+    """Async generator counterpart of crawl, yielding aiofetch.AsyncPage objects.
+
+    seeds, if given, is an async iterable such as seeds.seed_urls_async.
+    """
+    frontier = _Frontier(start_url, max_pages, page_store)
+    pages = [start_page or fetch_page_async(start_url, client)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(page):
+        async with semaphore:
+            await page.load()
+        return _load(page)
+
+    for depth in range(max_depth + 1):
+        for page in await asyncio.gather(*map(load, pages)):
+            if page is None or not frontier.accept(page, depth):
+                continue
+            yield page
+            if depth < max_depth:
+                frontier.follow(page)
+        if depth == 0 and seeds is not None and max_depth > 0:
+            while frontier.budget > 0:
+                url = await anext(seeds, None)
+                if url is None:
+                    break
+                frontier.queue(normalize_url(url))
+        pages = [fetch_page_async(url, client, headers) for url, headers in frontier.advance()]
+        if not pages or exhausted():
+            break
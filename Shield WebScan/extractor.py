@@ -0,0 +1,103 @@
+"""Lightweight, incremental extraction of forms, links and page metadata from HTML.
+
+Only <form>, <input>, <textarea>, <select>, <a>, <script> and <meta> tags
+are looked at, with one regex over the raw bytes, so no document tree is
+built. Body chunks can be fed as they arrive. Forms come out as dicts of
+their action, method and inputs; script sources and meta generator tags
+are kept for technology fingerprinting.
+"""
+import html
+import re
+
+_TAG = re.compile(rb"<(/?)(form|input|textarea|select|a|script|meta)\b([^>]*)>", re.IGNORECASE)
+_ATTRIBUTE = re.compile(
+    rb"""([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+)))?""")
+# An unfinished tag longer than this at the end of a chunk is dropped
+MAX_TAG_BYTES = 64 * 1024
+
+
+def _attributes(raw):
+    """Tag attributes as a dict of lowercase names to unescaped str values."""
+    attributes = {}
+    for match in _ATTRIBUTE.finditer(raw):
+        name = match.group(1).decode("utf-8", "replace").lower()
+        if name in attributes:
+            continue
+        value = match.group(2) or match.group(3) or match.group(4) or b""
+        attributes[name] = html.unescape(value.decode("utf-8", "replace"))
+    return attributes
+
+
+class FormExtractor:
+    """Collects forms, link targets, script sources and generator tags from HTML fed in chunks of bytes."""
+
+    def __init__(self):
+        self.forms = []
+        self.hrefs = []
+        self.scripts = []
+        self.generators = []
+        self._form = None
+        self._tail = b""
+
+    def feed(self, data):
+        buffer = self._tail + data
+        end = 0
+        for match in _TAG.finditer(buffer):
+            self._handle(match.group(1) == b"/", match.group(2).lower(), match.group(3))
+            end = match.end()
+
+        # Keep a tag cut off at the end of the chunk for the next one
+        start = buffer.rfind(b"<", end)
+        if start != -1 and buffer.find(b">", start) == -1 and len(buffer) - start <= MAX_TAG_BYTES:
+            self._tail = buffer[start:]
+        else:
+            self._tail = b""
+
+    def _handle(self, closing, tag, raw):
+        if tag == b"form":
+            if closing:
+                self._form = None
+                return
+            attributes = _attributes(raw)
+            self._form = {
+                "action": attributes.get("action"),
+                "method": attributes.get("method", "get").lower(),
+                "inputs": [],
+            }
+            self.forms.append(self._form)
+        elif tag == b"a":
+            if not closing:
+                href = _attributes(raw).get("href")
+                if href is not None:
+                    self.hrefs.append(href)
+        elif tag == b"script":
+            if not closing:
+                src = _attributes(raw).get("src")
+                if src:
+                    self.scripts.append(src)
+        elif tag == b"meta":
+            attributes = _attributes(raw)
+            if attributes.get("name", "").lower() == "generator" and attributes.get("content"):
+                self.generators.append(attributes["content"])
+        elif not closing and self._form is not None:
+            attributes = _attributes(raw)
+            default_type = "text" if tag == b"input" else tag.decode()
+            self._form["inputs"].append({
+                "type": attributes.get("type", default_type) if tag == b"input" else default_type,
+                "name": attributes.get("name"),
+                "value": attributes.get("value", ""),
+            })
+
+
+def extract_page(body, chunk_size=64 * 1024):
+    """Feed body through a FormExtractor in chunks and return the extractor."""
+    extractor = FormExtractor()
+    for start in range(0, len(body), chunk_size):
+        extractor.feed(body[start:start + chunk_size])
+    return extractor
+
+
+def extract_forms(body, chunk_size=64 * 1024):
+    """Return (forms, hrefs) found in body, fed through the extractor in chunks."""
+    extractor = extract_page(body, chunk_size)
+    return extractor.forms, extractor.hrefs
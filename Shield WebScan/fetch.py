@@ -0,0 +1,156 @@
+"""Per-scan page context so every check reads one fetch of the target."""
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+import requests
+
+from extractor import extract_page
+from metrics import record_bytes
+
+# Bodies are read in chunks and cut off after this many bytes
+MAX_BODY_BYTES = 2 * 1024 * 1024
+BODY_CHUNK_SIZE = 64 * 1024
+# Seconds to connect, and to wait for the headers and each read of the body
+HTTP_TIMEOUT = (5, 10)
+
+
+def read_body(response, max_bytes=MAX_BODY_BYTES):
+    """Read a streamed response's body, keeping at most max_bytes of it.
+
+    The kept bytes become response.content, and the connection is released
+    as soon as the cap is reached. Returns True if the body was truncated.
+    """
+    chunks = []
+    size = 0
+    truncated = False
+    try:
+        for chunk in response.iter_content(BODY_CHUNK_SIZE):
+            if size + len(chunk) > max_bytes:
+                chunks.append(chunk[:max_bytes - size])
+                size = max_bytes
+                truncated = True
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+    finally:
+        response.close()
+        record_bytes(urlsplit(response.url).hostname, size)
+    response._content = b"".join(chunks)
+    response._content_consumed = True
+    return truncated
+
+
+class PageContext:
+    """A single GET of a URL shared by all checks in one scan.
+
+    The request is made once, by whichever check reads the response first;
+    checks running at the same time wait for that fetch. If it failed, the
+    original exception is re-raised on every read, so each check still
+    reports the error in its own words.
+
+    request_headers are sent with the GET, e.g. conditional headers for a
+    rescan. The crawler sets `unchanged` and `previous` when the page is
+    the same as in the last scan (see rescan.PageStore).
+
+    At most max_bytes of the body are read; `truncated` says whether
+    anything was cut off.
+    """
+
+    def __init__(self, url, session, request_headers=None, max_bytes=MAX_BODY_BYTES):
+        self.url = url
+        self.request_headers = request_headers
+        self.max_bytes = max_bytes
+        self.truncated = False
+        self.unchanged = False
+        self.previous = None
+        self.links = None
+        self._session = session
+        self._fetched = False
+        self._response = None
+        self._error = None
+        self._extracted = None
+        self._lock = threading.Lock()
+        self._extract_lock = threading.Lock()
+
+    @property
+    def response(self):
+        with self._lock:
+            if not self._fetched:
+                try:
+                    response = self._session.get(self.url, headers=self.request_headers, stream=True,
+                                                     timeout=HTTP_TIMEOUT)
+                    self.truncated = read_body(response, self.max_bytes)
+                    self._response = response
+                except Exception as e:
+                    self._error = e
+                self._fetched = True
+        if self._error is not None:
+            raise self._error
+        return self._response
+
+    @property
+    def status_code(self):
+        return self.response.status_code
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+    @property
+    def cookies(self):
+        return self.response.cookies
+
+    @property
+    def content(self):
+        return self.response.content
+
+    @property
+    def content_hash(self):
+        return hashlib.sha1(self.content).hexdigest()
+
+    @property
+    def forms(self):
+        """Details of every form on the page: its action, method and inputs."""
+        return self._extract().forms
+
+    @property
+    def hrefs(self):
+        """Raw href values of the page's <a> tags."""
+        return self._extract().hrefs
+
+    @property
+    def scripts(self):
+        """src values of the page's <script> tags."""
+        return self._extract().scripts
+
+    @property
+    def generators(self):
+        """Contents of the page's <meta name="generator"> tags."""
+        return self._extract().generators
+
+    def _extract(self):
+        with self._extract_lock:
+            if self._extracted is None:
+                self._extracted = extract_page(self.content)
+            return self._extracted
+
+
+def fetch_page(url, session, request_headers=None, max_bytes=MAX_BODY_BYTES):
+    """Wrap url in a PageContext that fetches it once, on first use."""
+    return PageContext(url, session, request_headers, max_bytes)
+
+
+def isolated_session(session):
+    """A session with its own cookie jar that shares session's connection pools.
+
+    Headers, cookies and TLS settings are copied from session. Do not close
+    the returned session: its adapters belong to session.
+    """
+    clone = requests.Session()
+    clone.headers.update(session.headers)
+    clone.cookies.update(session.cookies.copy())
+    clone.verify = session.verify
+    for prefix, adapter in session.adapters.items():
+        clone.mount(prefix, adapter)
+    return clone
@@ -0,0 +1,226 @@
+"""Typed result records returned by every check.
+
+Each record is a small slotted dataclass whose str() is the line shown on
+the results page, so templates and text diffs need nothing else. For
+machines, records serialize to flat dicts tagged with their "type";
+encode() writes them as compact JSON, with orjson when it is installed.
+"""
+import json
+from dataclasses import dataclass, fields
+from typing import ClassVar, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@dataclass(frozen=True, slots=True)
+class Info:
+    """A neutral statement about the target."""
+    kind: ClassVar[str] = "info"
+    text: str
+
+    def __str__(self):
+        return self.text
+
+
+@dataclass(frozen=True, slots=True)
+class Note:
+    """How a result was produced (cached, reused, skipped), not a fact about the target."""
+    kind: ClassVar[str] = "note"
+    text: str
+
+    def __str__(self):
+        return self.text
+
+
+@dataclass(frozen=True, slots=True)
+class Problem:
+    """A check, or part of one, that could not be completed."""
+    kind: ClassVar[str] = "error"
+    text: str
+
+    def __str__(self):
+        return self.text
+
+
+@dataclass(frozen=True, slots=True)
+class FetchFailed:
+    """A form target that could not be fetched while testing it."""
+    kind: ClassVar[str] = "fetch_failed"
+    url: str
+
+    def __str__(self):
+        return f"Failed to fetch: {self.url}"
+
+
+@dataclass(frozen=True, slots=True)
+class SqlInjection:
+    """A form that sqli.FormTester found injectable.
+
+    technique is "error" (the response showed dbms's error message),
+    "boolean" or "time" (blind; dbms is known for time-based only).
+    """
+    kind: ClassVar[str] = "sql_injection"
+    url: str
+    dbms: Optional[str] = None
+    technique: str = "error"
+
+    def __str__(self):
+        if self.technique == "error":
+            return f"SQL injection attack vulnerability in link: {self.url} ({self.dbms} error)"
+        how = f"{self.technique}-based blind, {self.dbms}" if self.dbms else f"{self.technique}-based blind"
+        return f"SQL injection attack vulnerability in link: {self.url} ({how})"
+
+
+@dataclass(frozen=True, slots=True)
+class OpenPort:
+    kind: ClassVar[str] = "open_port"
+    port: int
+    service: Optional[str] = None
+    banner: Optional[str] = None
+
+    def __str__(self):
+        if self.service:
+            return f"Port {self.port}: Open ({self.service}: {self.banner})" if self.banner \
+                else f"Port {self.port}: Open ({self.service})"
+        if self.banner:
+            return f"Port {self.port}: Open ({self.banner})"
+        return f"Port {self.port}: Open"
+
+
+@dataclass(frozen=True, slots=True)
+class Fact:
+    """A labelled value, such as a host IP or the Server header."""
+    kind: ClassVar[str] = "fact"
+    label: str
+    value: str
+
+    def __str__(self):
+        return f"{self.label}: {self.value}"
+
+
+@dataclass(frozen=True, slots=True)
+class Technology:
+    """A technology the target shows signs of, from fingerprints.py."""
+    kind: ClassVar[str] = "technology"
+    name: str
+    version: Optional[str] = None
+    category: Optional[str] = None
+
+    def __str__(self):
+        name = f"{self.name} {self.version}" if self.version else self.name
+        return f"Technology: {name} ({self.category})" if self.category else f"Technology: {name}"
+
+
+@dataclass(frozen=True, slots=True)
+class MissingHeader:
+    kind: ClassVar[str] = "missing_header"
+    name: str
+
+    def __str__(self):
+        return f"Missing {self.name} header."
+
+
+@dataclass(frozen=True, slots=True)
+class Cookie:
+    kind: ClassVar[str] = "cookie"
+    name: str
+    value: str
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+@dataclass(frozen=True, slots=True)
+class DisallowedPath:
+    kind: ClassVar[str] = "disallowed_path"
+    path: str
+
+    def __str__(self):
+        return self.path
+
+
+@dataclass(frozen=True, slots=True)
+class AllowedPath:
+    kind: ClassVar[str] = "allowed_path"
+    path: str
+
+    def __str__(self):
+        return self.path
+
+
+@dataclass(frozen=True, slots=True)
+class Partial:
+    """Ends the results of a check that was cut short by the scan's budget, or by its deadline ("deadline")."""
+    kind: ClassVar[str] = "partial"
+    reason: str
+
+    def __str__(self):
+        if self.reason == "deadline":
+            return "Partial result: the check ran out of time before it finished."
+        return f"Partial result: the scan's {self.reason} budget ran out before this check finished."
+
+
+@dataclass(frozen=True, slots=True)
+class Change:
+    """A line added ("+") or removed ("-") in a section since the last scan."""
+    kind: ClassVar[str] = "change"
+    section: str
+    sign: str
+    text: str
+
+    def __str__(self):
+        return f"{self.section}: {self.sign} {self.text}"
+
+
+RECORD_TYPES = {cls.kind: cls for cls in (
+    Info, Note, Problem, FetchFailed, SqlInjection, OpenPort, Fact, Technology, MissingHeader, Cookie,
+    DisallowedPath, AllowedPath, Partial, Change,
+)}
+_FIELDS = {cls: tuple(field.name for field in fields(cls)) for cls in RECORD_TYPES.values()}
+
+
+def to_dict(record):
+    """The record as a flat dict tagged with its type; None fields are left out."""
+    data = {"type": record.kind}
+    for name in _FIELDS[type(record)]:
+        value = getattr(record, name)
+        if value is not None:
+            data[name] = value
+    return data
+
+
+def from_dict(data):
+    """Rebuild a record from to_dict output. Plain strings become Info."""
+    if isinstance(data, str):
+        return Info(data)
+    data = dict(data)
+    return RECORD_TYPES[data.pop("type")](**data)
+
+
+def dump(result):
+    """A check's records as a list of dicts, for JSON stores."""
+    return [to_dict(record) for record in result]
+
+
+def load(items):
+    """The inverse of dump; also accepts lists of plain result lines."""
+    return [from_dict(item) for item in items]
+
+
+def _default(value):
+    if type(value) in _FIELDS:
+        return to_dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, check_circular=False, default=_default)
+
+
+def encode(value):
+    """Compact JSON bytes for value, which may contain records anywhere."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+    return _encoder.encode(value).encode()
@@ -0,0 +1,438 @@
+"""Technology fingerprints matched against one fetched response.
+
+TECHNOLOGY_SIGNATURES maps each technology to patterns for response
+headers, cookies, <meta name="generator"> contents, <script src> values
+and the HTML body. They are compiled once, at import, into a
+SignatureIndex, so the cost of matching a response hardly depends on how
+many signatures there are:
+
+- Header and cookie patterns are filed under the header or cookie name
+  and only tried when the response has that header or cookie.
+- Every other pattern is filed under its anchor: the longest literal word
+  it always matches as a whole word. Each text is lowercased and split
+  into words once, with bytes.translate, and only the signatures whose
+  anchor is among those words are tried, on a window around the anchor.
+
+The first capture group of a pattern, if it matched, is the version.
+Like the SQL error signatures, wildcards must be bounded so a match never
+strays more than WINDOW bytes from its anchor.
+"""
+import re
+
+# Patterns by technology. "headers" and "cookies" map a name to a pattern
+# for its value ("" only checks that it is there); "generator", "scripts"
+# and "html" are lists of patterns that each need an anchor word.
+TECHNOLOGY_SIGNATURES = {
+    "nginx": {"category": "Web server", "headers": {"Server": r"nginx(?:/([\d.]+))?"}},
+    "Apache HTTP Server": {"category": "Web server", "headers": {"Server": r"Apache(?:/([\d.]+))?(?!-)"}},
+    "Microsoft IIS": {"category": "Web server", "headers": {"Server": r"Microsoft-IIS(?:/([\d.]+))?"}},
+    "LiteSpeed": {"category": "Web server", "headers": {"Server": r"LiteSpeed"}},
+    "OpenResty": {"category": "Web server", "headers": {"Server": r"openresty(?:/([\d.]+))?"}},
+    "Caddy": {"category": "Web server", "headers": {"Server": r"Caddy"}},
+    "Apache Tomcat": {"category": "Web server", "headers": {"Server": r"Apache-Coyote(?:/([\d.]+))?"}},
+    "Jetty": {"category": "Web server", "headers": {"Server": r"Jetty"}},
+    "Kestrel": {"category": "Web server", "headers": {"Server": r"Kestrel"}},
+    "Gunicorn": {"category": "Web server", "headers": {"Server": r"gunicorn(?:/([\d.]+))?"}},
+    "Werkzeug": {"category": "Web server", "headers": {"Server": r"Werkzeug(?:/([\d.]+))?"}},
+    "Google Web Server": {"category": "Web server", "headers": {"Server": r"^gws$"}},
+    "Google Servlet Engine": {"category": "Web server", "headers": {"Server": r"^GSE$"}},
+    "Envoy": {"category": "Reverse proxy", "headers": {"Server": r"envoy", "X-Envoy-Upstream-Service-Time": ""}},
+    "Varnish": {"category": "Caching", "headers": {"Via": r"varnish", "X-Varnish": ""}},
+    "Cloudflare": {
+        "category": "CDN",
+        "headers": {"Server": r"cloudflare", "CF-RAY": ""},
+        "cookies": {"__cf_bm": "", "__cfduid": ""},
+    },
+    "Amazon CloudFront": {"category": "CDN", "headers": {"Via": r"CloudFront", "X-Amz-Cf-Id": ""}},
+    "Amazon S3": {"category": "CDN", "headers": {"Server": r"AmazonS3"}},
+    "Akamai": {"category": "CDN", "headers": {"X-Akamai-Transformed": ""}},
+    "Fastly": {"category": "CDN", "headers": {"Fastly-Debug-Digest": "", "X-Served-By": r"cache-"}},
+    "Sucuri": {"category": "Security", "headers": {"Server": r"Sucuri", "X-Sucuri-ID": ""}},
+    "Vercel": {"category": "PaaS", "headers": {"Server": r"Vercel", "X-Vercel-Id": ""}},
+    "Netlify": {"category": "PaaS", "headers": {"Server": r"Netlify", "X-Nf-Request-Id": ""}},
+    "GitHub Pages": {"category": "PaaS", "headers": {"Server": r"GitHub\.com"}},
+    "PHP": {
+        "category": "Programming language",
+        "headers": {"X-Powered-By": r"PHP(?:/([\d.]+))?"},
+        "cookies": {"PHPSESSID": ""},
+    },
+    "Python": {"category": "Programming language", "headers": {"Server": r"Python(?:/([\d.]+))?"}},
+    "Java": {"category": "Programming language", "cookies": {"JSESSIONID": ""}},
+    "ASP.NET": {
+        "category": "Web framework",
+        "headers": {"X-Powered-By": r"ASP\.NET", "X-AspNet-Version": r"([\d.]+)"},
+        "cookies": {"ASP.NET_SessionId": "", ".ASPXAUTH": ""},
+    },
+    "Express": {"category": "Web framework", "headers": {"X-Powered-By": r"^Express$"}},
+    "Laravel": {"category": "Web framework", "cookies": {"laravel_session": ""}},
+    "Django": {"category": "Web framework", "html": [r"name=[\"']csrfmiddlewaretoken[\"']"]},
+    "Ruby on Rails": {
+        "category": "Web framework",
+        "headers": {"X-Powered-By": r"Phusion Passenger"},
+        "html": [r"<meta name=\"csrf-param\" content=\"authenticity_token\""],
+    },
+    "Next.js": {
+        "category": "Web framework",
+        "headers": {"X-Powered-By": r"^Next\.js(?: ([\d.]+))?"},
+        "scripts": [r"/_next/static/"],
+    },
+    "Nuxt.js": {"category": "Web framework", "scripts": [r"/_nuxt/"], "html": [r"<div id=\"__nuxt\""]},
+    "WordPress": {
+        "category": "CMS",
+        "generator": [r"WordPress(?: ([\d.]+))?"],
+        "scripts": [r"/wp-includes/", r"/wp-content/"],
+        "html": [r"/wp-content/"],
+        "cookies": {"wordpress_test_cookie": ""},
+    },
+    "Drupal": {
+        "category": "CMS",
+        "generator": [r"Drupal(?: (\d+))?"],
+        "headers": {"X-Drupal-Cache": "", "X-Generator": r"Drupal(?: (\d+))?"},
+        "scripts": [r"/misc/drupal\.js"],
+    },
+    "Joomla": {"category": "CMS", "generator": [r"Joomla!(?: ([\d.]+))?"]},
+    "Ghost": {"category": "CMS", "generator": [r"Ghost(?: ([\d.]+))?"]},
+    "Wix": {"category": "CMS", "generator": [r"Wix\.com Website Builder"]},
+    "Squarespace": {"category": "CMS", "scripts": [r"squarespace\.com/"]},
+    "Hugo": {"category": "Static site generator", "generator": [r"Hugo ([\d.]+)"]},
+    "Jekyll": {"category": "Static site generator", "generator": [r"Jekyll v([\d.]+)"]},
+    "Shopify": {"category": "Ecommerce", "headers": {"X-ShopId": ""}, "scripts": [r"cdn\.shopify\.com/"]},
+    "Magento": {"category": "Ecommerce", "scripts": [r"/static/version\d+/frontend/"], "html": [r"Mage\.Cookies"]},
+    "jQuery": {
+        "category": "JavaScript library",
+        "scripts": [r"jquery[.-]([\d.]+)(?:\.slim)?(?:\.min)?\.js", r"/jquery(?:\.slim)?(?:\.min)?\.js"],
+    },
+    "jQuery UI": {"category": "JavaScript library", "scripts": [r"jquery-ui(?:[.-]([\d.]+))?(?:\.min)?\.js"]},
+    "Lodash": {"category": "JavaScript library", "scripts": [r"lodash(?:\.min)?\.js"]},
+    "Moment.js": {"category": "JavaScript library", "scripts": [r"moment(?:\.min)?\.js"]},
+    "Modernizr": {"category": "JavaScript library", "scripts": [r"modernizr(?:[.-]([\d.]+))?(?:\.min)?\.js"]},
+    "htmx": {"category": "JavaScript library", "scripts": [r"htmx(?:\.min)?\.js"]},
+    "React": {
+        "category": "JavaScript framework",
+        "scripts": [r"react(?:-dom)?(?:\.production)?(?:\.min)?\.js"],
+        "html": [r"data-reactroot"],
+    },
+    "Vue.js": {"category": "JavaScript framework", "scripts": [r"/vue(?:\.min)?\.js", r"/vue@([\d.]+)"]},
+    "Angular": {"category": "JavaScript framework", "html": [r"ng-version=\"([\d.]+)\""]},
+    "AngularJS": {"category": "JavaScript framework", "scripts": [r"angular(?:\.min)?\.js"], "html": [r" ng-app="]},
+    "Alpine.js": {"category": "JavaScript framework", "scripts": [r"alpinejs"]},
+    "Bootstrap": {
+        "category": "UI framework",
+        "scripts": [r"bootstrap(?:\.bundle)?(?:\.min)?\.js"],
+        "html": [r"bootstrap(?:\.min)?\.css"],
+    },
+    "Font Awesome": {
+        "category": "Font script",
+        "scripts": [r"kit\.fontawesome\.com/"],
+        "html": [r"font-awesome(?:\.min)?\.css"],
+    },
+    "Google Font API": {"category": "Font script", "html": [r"fonts\.googleapis\.com/"]},
+    "Google Analytics": {
+        "category": "Analytics",
+        "scripts": [r"google-analytics\.com/(?:ga|analytics)\.js", r"googletagmanager\.com/gtag/js"],
+        "html": [r"GoogleAnalyticsObject"],
+    },
+    "Google Tag Manager": {
+        "category": "Tag manager",
+        "scripts": [r"googletagmanager\.com/gtm\.js"],
+        "html": [r"googletagmanager\.com/ns\.html"],
+    },
+    "reCAPTCHA": {"category": "Security", "scripts": [r"/recaptcha/api\.js"]},
+    "Cloudflare Browser Insights": {"category": "Analytics", "scripts": [r"static\.cloudflareinsights\.com/"]},
+}
+
+# Bytes searched either side of an anchor hit
+WINDOW = 200
+# Anchor hits verified per signature before giving up on it
+MAX_HITS = 16
+# Shortest literal word accepted as an anchor
+MIN_ANCHOR = 3
+
+# Lowercases ASCII letters and digits and turns every other byte into a space
+_WORDS = bytes(ord(chr(c).lower()) if chr(c).isascii() and chr(c).isalnum() else 32 for c in range(256))
+
+
+def _is_word(char):
+    return char.isascii() and char.isalnum()
+
+
+def _skip_class(pattern, i):
+    """Index just past the character class starting at pattern[i]."""
+    i += 1
+    if pattern[i:i + 1] == "^":
+        i += 1
+    if pattern[i:i + 1] == "]":
+        i += 1
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+    return i + 1
+
+
+def _skip_group(pattern, i):
+    """Index just past the group opening at pattern[i]."""
+    depth = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            i = _skip_class(pattern, i)
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    raise ValueError(f"Unbalanced group in {pattern!r}")
+
+
+def _skip_quantifier(pattern, i):
+    """(index past the quantifier at pattern[i], if any; whether it allows zero repeats)."""
+    match = re.match(r"(?:([?*+])|\{(\d*)(?:,\d*)?\})[?+]?", pattern[i:])
+    if match is None:
+        return i, False
+    return i + match.end(), match.group(1) in ("?", "*") or match.group(2) in ("", "0")
+
+
+def _items(pattern):
+    """Split a pattern into its top-level items.
+
+    Each item is (literal, may_start, may_end, optional): the literal
+    character or None, whether the text it matches may start or end with
+    a word character, and whether it may match nothing at all. A top-level
+    alternation comes back as None.
+    """
+    items = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        literal = None
+        if char == "|":
+            return None
+        if char == "\\":
+            escaped = pattern[i + 1]
+            end = i + 2
+            word = escaped.isdigit() or escaped in "dwDSB"
+            if not _is_word(escaped):
+                literal = escaped
+        elif char == "[":
+            end = _skip_class(pattern, i)
+            body = pattern[i + 1:end - 1]
+            word = body.startswith("^") or any(_is_word(c) for c in body)
+        elif char == "(":
+            end = _skip_group(pattern, i)
+            inner = pattern[i + 1:end - 1]
+            if inner.startswith("?:"):
+                inner = inner[2:]
+            elif inner.startswith("?P<"):
+                inner = inner[inner.index(">") + 1:]
+            elif inner.startswith("?P="):
+                # A backreference could be anything
+                items.append((None, True, True, False))
+                i = end
+                continue
+            elif inner.startswith("?"):
+                # Lookarounds and inline flags match no text
+                items.append((None, False, False, True))
+                i = end
+                continue
+            branches = [_items(branch) for branch in _branches(inner)]
+            starts = any(_may_start(branch) for branch in branches)
+            ends = any(_may_end(branch) for branch in branches)
+            empty = any(all(item[3] for item in branch) for branch in branches)
+            end, optional = _skip_quantifier(pattern, end)
+            items.append((None, starts, ends, optional or empty))
+            i = end
+            continue
+        elif char in "^$":
+            items.append((None, False, False, True))
+            i += 1
+            continue
+        else:
+            end = i + 1
+            word = char == "." or _is_word(char)
+            literal = char if char != "." else None
+        quantified_end, optional = _skip_quantifier(pattern, end)
+        if quantified_end != end:
+            # A repeated character is not a fixed part of a word
+            literal = None
+        items.append((literal, word, word, optional))
+        i = quantified_end
+    return items
+
+
+def _branches(pattern):
+    """pattern split on its top-level |."""
+    branches = []
+    start = i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+        elif char == "[":
+            i = _skip_class(pattern, i)
+        elif char == "(":
+            i = _skip_group(pattern, i)
+        else:
+            if char == "|":
+                branches.append(pattern[start:i])
+                start = i + 1
+            i += 1
+    branches.append(pattern[start:])
+    return branches
+
+
+def _may_start(items):
+    """Whether text matched by items may start with a word character."""
+    for _, may_start, _, optional in items:
+        if may_start:
+            return True
+        if not optional:
+            return False
+    return False
+
+
+def _may_end(items):
+    return _may_start([(literal, may_end, may_start, optional)
+                       for literal, may_start, may_end, optional in reversed(items)])
+
+
+def _anchor(pattern):
+    """The longest literal word pattern always matches as a whole word, or None."""
+    items = _items(pattern)
+    if items is None:
+        return None
+    best = None
+    i = 0
+    while i < len(items):
+        if not _is_word(items[i][0] or ""):
+            i += 1
+            continue
+        start = i
+        while i < len(items) and _is_word(items[i][0] or ""):
+            i += 1
+        if _may_end(items[:start]) or _may_start(items[i:]):
+            continue
+        word = "".join(item[0] for item in items[start:i]).lower()
+        if len(word) >= MIN_ANCHOR and (best is None or len(word) > len(best)):
+            best = word
+    return best.encode() if best else None
+
+
+def _version(match):
+    if match.re.groups and match.group(1):
+        return match.group(1).decode("utf-8", "replace").rstrip(".")
+    return None
+
+
+class _Field:
+    """Signatures for one kind of text, filed by anchor word."""
+
+    def __init__(self):
+        self.by_anchor = {}
+        self.anchors = set()
+        self.always = []
+
+    def add(self, technology, pattern, anchored=True):
+        regex = re.compile(pattern.encode(), re.IGNORECASE)
+        anchor = _anchor(pattern)
+        if anchor is None:
+            if anchored:
+                raise ValueError(f"Signature {pattern!r} for {technology} has no anchor word")
+            self.always.append((technology, regex))
+            return
+        self.by_anchor.setdefault(anchor, []).append((technology, regex))
+        self.anchors.add(anchor)
+
+    def match(self, text):
+        """Yield (technology, version) for each signature that matches text (bytes)."""
+        for technology, regex in self.always:
+            match = regex.search(text)
+            if match is not None:
+                yield technology, _version(match)
+        if not self.anchors:
+            return
+
+        # Spaces around the words make every whole word findable as " word "
+        words = b" " + text.translate(_WORDS) + b" "
+        for anchor in set(words.split()) & self.anchors:
+            needle = b" " + anchor + b" "
+            for technology, regex in self.by_anchor[anchor]:
+                position = words.find(needle)
+                hits = 0
+                while position != -1 and hits < MAX_HITS:
+                    # words[position] is the space before the anchor, so the
+                    # anchor starts at text[position]
+                    match = regex.search(text, max(position - WINDOW, 0), position + len(anchor) + WINDOW)
+                    if match is not None:
+                        yield technology, _version(match)
+                        break
+                    position = words.find(needle, position + len(anchor))
+                    hits += 1
+
+
+class SignatureIndex:
+    """Signatures compiled for matching a whole response in one pass."""
+
+    def __init__(self, signatures):
+        self.order = {}
+        self.categories = {}
+        self.headers = {}
+        self.cookies = {}
+        self.generator = _Field()
+        self.scripts = _Field()
+        self.html = _Field()
+        for technology, signature in signatures.items():
+            self.order[technology] = len(self.order)
+            self.categories[technology] = signature.get("category")
+            for name, pattern in signature.get("headers", {}).items():
+                self.headers.setdefault(name.lower(), _Field()).add(technology, pattern, anchored=False)
+            for name, pattern in signature.get("cookies", {}).items():
+                self.cookies.setdefault(name.lower(), _Field()).add(technology, pattern, anchored=False)
+            for field in ("generator", "scripts", "html"):
+                for pattern in signature.get(field, ()):
+                    getattr(self, field).add(technology, pattern)
+
+    def match(self, headers, cookies, generators, scripts, body):
+        """Return (technology, version, category) for every technology found, in table order.
+
+        headers and cookies are name -> value mappings, generators and
+        scripts lists of str, and body the raw response body.
+        """
+        found = {}
+
+        def note(matches):
+            for technology, version in matches:
+                if found.get(technology) is None:
+                    found[technology] = version
+
+        for name, value in headers.items():
+            field = self.headers.get(name.lower())
+            if field is not None:
+                note(field.match(value.encode("utf-8", "replace")))
+        for name, value in cookies.items():
+            field = self.cookies.get(name.lower())
+            if field is not None:
+                note(field.match(value.encode("utf-8", "replace")))
+        # One entry per line; patterns cannot match across a newline
+        note(self.generator.match("\n".join(generators).encode("utf-8", "replace")))
+        note(self.scripts.match("\n".join(scripts).encode("utf-8", "replace")))
+        note(self.html.match(body))
+
+        return [(technology, found[technology], self.categories[technology])
+                for technology in sorted(found, key=self.order.__getitem__)]
+
+
+_index = SignatureIndex(TECHNOLOGY_SIGNATURES)
+
+
+def detect_technologies(page):
+    """(technology, version, category) for each technology page shows signs of.
+
+    page is a fetched fetch.PageContext or aiofetch.AsyncPage.
+    """
+    cookies = {cookie.name: cookie.value or "" for cookie in page.cookies}
+    return _index.match(page.headers, cookies, page.generators, page.scripts, page.content)
@@ -0,0 +1,221 @@
+"""Scan job queue in a SQLite file shared by a coordinator and worker processes.
+
+The coordinator enqueues targets; any number of workers, on this machine
+or on others that share the file, lease jobs and run them. A lease lasts
+LEASE_SECONDS and the worker renews it with heartbeats while the scan runs.
+If a worker dies, its lease runs out and the job goes back to the next
+worker that asks, up to MAX_ATTEMPTS times. Results are written back check
+by check, and only by the worker that currently holds the lease.
+"""
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from findings import dump
+
+QUEUE_DB = os.path.join(tempfile.gettempdir(), "shield-webscan-queue.sqlite3")
+# Seconds a lease lasts without a heartbeat, and seconds between heartbeats
+LEASE_SECONDS = 60
+HEARTBEAT_INTERVAL = 15
+# Leases handed out for one job before it is marked failed
+MAX_ATTEMPTS = 3
+# Seconds an idle worker waits before asking for a job again
+POLL_INTERVAL = 1.0
+# Scans each worker process runs at once
+WORKER_CONCURRENCY = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    ports TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    enqueued_at REAL NOT NULL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires, enqueued_at);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+"""
+
+
+class JobQueue:
+    """A handle on the queue file; one per process, safe to share between threads."""
+
+    def __init__(self, db_path=QUEUE_DB):
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def enqueue(self, url, ports=None):
+        """Add a scan of url to the queue and return its job ID."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, url, ports, status, enqueued_at) VALUES (?, ?, ?, 'queued', ?)",
+                (job_id, url, json.dumps(ports) if ports else None, time.time()))
+        return job_id
+
+    def lease(self, worker_id, lease_seconds=LEASE_SECONDS):
+        """Claim the oldest queued job, or one whose lease ran out, for worker_id.
+
+        Returns a dict with id, url, ports and attempts, or None if there is
+        nothing to do. Jobs that ran out of attempts are marked failed.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'failed', finished_at = ?, lease_owner = NULL, "
+                    "error = 'Gave up after ' || attempts || ' attempts' "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, now, MAX_ATTEMPTS))
+                row = self._db.execute(
+                    "SELECT id, url, ports, attempts FROM jobs "
+                    "WHERE status = 'queued' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY enqueued_at LIMIT 1", (now,)).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                job_id, url, ports, attempts = row
+                self._db.execute(
+                    "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = ? "
+                    "WHERE id = ?", (worker_id, now + lease_seconds, attempts + 1, job_id))
+                # Drop what an earlier, crashed attempt wrote
+                self._db.execute("DELETE FROM results WHERE job_id = ?", (job_id,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return {"id": job_id, "url": url, "ports": json.loads(ports) if ports else None, "attempts": attempts + 1}
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=LEASE_SECONDS):
+        """Extend worker_id's lease on job_id; False if the lease was lost."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (time.time() + lease_seconds, job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def record_result(self, job_id, worker_id, position, name, result):
+        """Store one check's result records; ignored unless worker_id still holds the lease."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (job_id, position, name, result) "
+                "SELECT ?, ?, ?, ? FROM jobs WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                (job_id, position, name, json.dumps(dump(result)), job_id, worker_id))
+
+    def complete(self, job_id, worker_id, error=None):
+        """Mark job_id done (or failed, with error); False if the lease was lost."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ?, lease_owner = NULL "
+                "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+                ("failed" if error else "done", time.time(), error, job_id, worker_id))
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        """Status and results so far of job_id, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, status, attempts, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            results = self._db.execute(
+                "SELECT name, result FROM results WHERE job_id = ? ORDER BY position", (job_id,)).fetchall()
+        url, status, attempts, error = row
+        return {
+            "job_id": job_id,
+            "url": url,
+            "status": status,
+            "attempts": attempts,
+            "error": error,
+            "results": {name: json.loads(result) for name, result in results},
+        }
+
+    def counts(self):
+        """Number of jobs in each status."""
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+
+def _run_job(job_queue, worker_id, job):
+    """Scan one leased job, heartbeating until it is done."""
+    from app import build_checks
+    from budget import ScanBudget
+    from scheduler import run_checks
+
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            if not job_queue.heartbeat(job["id"], worker_id):
+                return
+
+    threading.Thread(target=heartbeat, name=f"heartbeat-{job['id']}", daemon=True).start()
+    try:
+        checks = build_checks(job["url"], job["ports"])
+        positions = {check.name: i for i, check in enumerate(checks)}
+
+        def record(name, result):
+            job_queue.record_result(job["id"], worker_id, positions[name], name, result)
+
+        run_checks(checks, on_result=record, budget=ScanBudget())
+        job_queue.complete(job["id"], worker_id)
+    except Exception as e:
+        job_queue.complete(job["id"], worker_id, error=f"Error scanning target: {str(e)}")
+    finally:
+        stop.set()
+
+
+def run_worker(db_path=QUEUE_DB, concurrency=WORKER_CONCURRENCY, worker_id=None, stop=None, idle_exit=None):
+    """Lease and run jobs until stop is set, with up to `concurrency` scans at once.
+
+    With idle_exit, the worker returns after that many seconds with nothing
+    to do; otherwise it keeps polling. Returns the number of jobs run.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    job_queue = JobQueue(db_path)
+    stop = stop or threading.Event()
+    slots = threading.Semaphore(concurrency)
+    idle_since = time.monotonic()
+    jobs_run = 0
+
+    def finished(_):
+        nonlocal idle_since
+        idle_since = time.monotonic()
+        slots.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="queue-worker") as pool:
+        while not stop.is_set():
+            slots.acquire()
+            job = job_queue.lease(worker_id)
+            if job is None:
+                slots.release()
+                if idle_exit is not None and time.monotonic() - idle_since >= idle_exit:
+                    break
+                stop.wait(POLL_INTERVAL)
+                continue
+            idle_since = time.monotonic()
+            jobs_run += 1
+            pool.submit(_run_job, job_queue, worker_id, job).add_done_callback(finished)
+    return jobs_run
@@ -0,0 +1,126 @@
+"""In-process background scan jobs with progress notification."""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from findings import Problem
+from scheduler import run_checks
+from rescan import CHANGES_SECTION
+
+# Scans running at once; further submissions wait in the pool queue
+MAX_RUNNING_JOBS = 8
+# Seconds a finished job is kept around for polling
+JOB_TTL = 3600
+
+_executor = ThreadPoolExecutor(max_workers=MAX_RUNNING_JOBS, thread_name_prefix="scan-job")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class ScanJob:
+    """A scan running in the background and the results it has so far."""
+
+    def __init__(self, url, checks, history=None, budget=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.budget = budget
+        self.check_names = [check.name for check in checks]
+        if history is not None:
+            self.check_names.append(CHANGES_SECTION)
+        self.results = {}
+        # Per-check time, requests and bytes, filled in when the checks end
+        self.timings = {}
+        # Every (name, result) reported, in order; a check whose stale
+        # cached result was shown first appears twice
+        self.events = []
+        self.status = "queued"
+        self.created = time.time()
+        self.finished = None
+        self._condition = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status == "done"
+
+    def ordered_results(self):
+        """Results completed so far, in check declaration order."""
+        with self._condition:
+            return {name: self.results[name] for name in self.check_names if name in self.results}
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "url": self.url,
+            "status": self.status,
+            "checks": self.check_names,
+            "results": self.ordered_results(),
+            "timings": self.timings,
+            "budget": self.budget.to_dict() if self.budget is not None else None,
+        }
+
+    def wait_for_update(self, seen, timeout):
+        """Block until there are more than `seen` events or the job is done.
+
+        Returns the events after the first `seen`.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.events) > seen or self.done, timeout)
+            return self.events[seen:]
+
+    def _set_status(self, status):
+        with self._condition:
+            self.status = status
+            if status == "done":
+                self.finished = time.time()
+            self._condition.notify_all()
+
+    def _record(self, name, result):
+        with self._condition:
+            self.results[name] = result
+            self.events.append((name, result))
+            self._condition.notify_all()
+
+    def _run(self, checks, cache, history):
+        self._set_status("running")
+        try:
+            results = run_checks(checks, on_result=self._record, cache=cache, timings=self.timings,
+                                 budget=self.budget)
+            if history is not None:
+                try:
+                    changes = history.compare_and_save(self.url, results)
+                except Exception as e:
+                    changes = [Problem(f"Error comparing with the last scan: {str(e)}")]
+                self._record(CHANGES_SECTION, changes)
+        finally:
+            self._set_status("done")
+
+
+def _prune_jobs():
+    """Forget finished jobs older than JOB_TTL."""
+    cutoff = time.time() - JOB_TTL
+    with _jobs_lock:
+        for job_id in [job_id for job_id, job in _jobs.items() if job.done and job.finished < cutoff]:
+            del _jobs[job_id]
+
+
+def submit_scan(url, checks, cache=None, history=None, budget=None):
+    """Queue a scan of url running the given checks and return its job.
+
+    Cached results from cache, if given, are reported as soon as the job
+    starts (see scheduler.run_checks). With a rescan.ScanHistory, the job
+    ends with a section listing what changed since the previous scan. A
+    budget.ScanBudget bounds the scan; its clock starts when the job does.
+    """
+    _prune_jobs()
+    job = ScanJob(url, checks, history, budget)
+    with _jobs_lock:
+        _jobs[job.id] = job
+    _executor.submit(job._run, checks, cache, history)
+    return job
+
+
+def get_job(job_id):
+    """Return the job with this ID, or None."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -0,0 +1,281 @@
+"""Counters and latency histograms for checks, HTTP requests and socket connects.
+
+Everything is kept in this process and rendered in the Prometheus text
+format by render(). Measurements taken while a check runs are also added
+to that check's Scope, which run_checks turns into the per-scan timing
+breakdown.
+"""
+import contextvars
+import threading
+import time
+
+from findings import Problem
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Distinct target label values kept; later targets are counted as "other"
+MAX_TARGETS = 500
+
+_metrics = []
+_targets = set()
+_targets_lock = threading.Lock()
+_scope = contextvars.ContextVar("scope", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """A monotonically increasing value per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, total in items:
+            yield f"{self.name}{_format_labels(self.labels, values)} {total}"
+
+
+class Histogram:
+    """Observations counted into cumulative LATENCY_BUCKETS per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *values):
+        with self._lock:
+            counts = self._values.get(values)
+            if counts is None:
+                # One slot per bucket, then +Inf, then the sum
+                counts = self._values[values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((values, list(counts)) for values, counts in self._values.items())
+        for values, counts in items:
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket{_format_labels(self.labels, values, [('le', bound)])} {count}"
+            yield f"{self.name}_bucket{_format_labels(self.labels, values, [('le', '+Inf')])} {counts[-2]}"
+            yield f"{self.name}_sum{_format_labels(self.labels, values)} {counts[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labels, values)} {counts[-2]}"
+
+
+check_seconds = Histogram("shield_check_duration_seconds", "Time taken by each check.", ("check",))
+checks_total = Counter("shield_checks_total", "Checks run, by outcome (ok, error, timeout, cached).",
+                       ("check", "outcome"))
+http_seconds = Histogram("shield_http_request_duration_seconds",
+                         "Time to response headers of outbound HTTP requests.", ("check", "target"))
+http_requests = Counter("shield_http_requests_total", "Outbound HTTP requests, by status class.",
+                        ("check", "target", "status"))
+http_errors = Counter("shield_http_errors_total", "Outbound HTTP requests that raised instead of returning.",
+                      ("check", "target", "error"))
+http_bytes = Counter("shield_http_received_bytes_total", "Response body bytes read.", ("check", "target"))
+connect_seconds = Histogram("shield_connect_duration_seconds", "Time taken by TCP connect attempts.",
+                            ("check", "target"))
+connects = Counter("shield_connects_total", "TCP connect attempts, by result (open, closed, filtered, error).",
+                   ("check", "target", "result"))
+
+
+def _target(target):
+    """The label value for target, capped at MAX_TARGETS distinct values."""
+    target = target or "unknown"
+    with _targets_lock:
+        if target in _targets:
+            return target
+        if len(_targets) >= MAX_TARGETS:
+            return "other"
+        _targets.add(target)
+        return target
+
+
+class Scope:
+    """What one check did during one scan: time, requests, errors, bytes, connects.
+
+    budget, if given, is the scan's budget.ScanBudget; bytes added to the
+    scope are charged to it, and denied counts the requests and connects
+    it refused. deadline is the time.monotonic() value at which the check
+    is given up, if it has one.
+    """
+
+    def __init__(self, check, target=None, budget=None, deadline=None):
+        self.check = check
+        self.target = target
+        self.budget = budget
+        self.deadline = deadline
+        self.outcome = None
+        self.seconds = None
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.connects = 0
+        self.denied = 0
+        self._lock = threading.Lock()
+
+    def add(self, requests=0, errors=0, bytes=0, connects=0, denied=0):
+        with self._lock:
+            self.requests += requests
+            self.errors += errors
+            self.bytes += bytes
+            self.connects += connects
+            self.denied += denied
+        if bytes and self.budget is not None:
+            self.budget.add_bytes(bytes)
+
+    def to_dict(self):
+        return {
+            "outcome": self.outcome,
+            "seconds": None if self.seconds is None else round(self.seconds, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "bytes": self.bytes,
+            "connects": self.connects,
+            "denied": self.denied,
+        }
+
+
+def current_scope():
+    """The Scope of the check running in this context, or None."""
+    return _scope.get()
+
+
+def _current(target):
+    """The current scope and the check and target labels to record under.
+
+    Inside a check, measurements are labelled with the scan's target rather
+    than the host or address actually contacted.
+    """
+    scope = _scope.get()
+    if scope is None:
+        return None, "none", _target(target)
+    return scope, scope.check, _target(scope.target or target)
+
+
+def run_in_scope(scope, func, *args):
+    """Call func(*args) with scope current and record how long it took.
+
+    A check that raises, or returns a single error line, counts as an
+    error. A scope already marked as timed out or stopped keeps that outcome.
+    """
+    token = _scope.set(scope)
+    started = time.monotonic()
+    result = None
+    try:
+        result = func(*args)
+        return result
+    finally:
+        _scope.reset(token)
+        _finish(scope, started, result)
+
+
+async def run_in_scope_async(scope, func, *args):
+    """Await func(*args) with scope current; the async form of run_in_scope."""
+    _scope.set(scope)
+    started = time.monotonic()
+    result = None
+    try:
+        result = await func(*args)
+        return result
+    finally:
+        _finish(scope, started, result)
+
+
+def _finish(scope, started, result):
+    seconds = time.monotonic() - started
+    outcome = "ok"
+    if result is None or (len(result) == 1 and isinstance(result[0], Problem)):
+        outcome = "error"
+    check_seconds.observe(seconds, scope.check)
+    if scope.outcome not in ("timeout", "stopped"):
+        scope.outcome = outcome
+        scope.seconds = seconds
+        checks_total.inc(scope.check, outcome)
+
+
+def carry(func):
+    """Wrap func to run with the caller's scope, e.g. on another thread's pool."""
+    scope = _scope.get()
+
+    def run(*args, **kwargs):
+        token = _scope.set(scope)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _scope.reset(token)
+
+    return run
+
+
+def record_check(check, outcome):
+    """Count a check that did not run to completion, e.g. timed out or cached."""
+    checks_total.inc(check, outcome)
+
+
+def record_http(target, seconds, status=None, error=None):
+    """Record one outbound HTTP request: its status code, or the exception it raised."""
+    scope, check, target = _current(target)
+    http_seconds.observe(seconds, check, target)
+    if error is not None:
+        http_errors.inc(check, target, type(error).__name__)
+    else:
+        http_requests.inc(check, target, f"{status // 100}xx")
+    if scope is not None:
+        scope.add(requests=1, errors=int(error is not None))
+
+
+def record_bytes(target, size):
+    """Record size bytes of response body read from target."""
+    scope, check, target = _current(target)
+    http_bytes.inc(check, target, amount=size)
+    if scope is not None:
+        scope.add(bytes=size)
+
+
+def record_connect(target, seconds, result):
+    """Record one TCP connect attempt and its result."""
+    scope, check, target = _current(target)
+    connect_seconds.observe(seconds, check, target)
+    connects.inc(check, target, result)
+    if scope is not None:
+        scope.add(connects=1, errors=int(result == "error"))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
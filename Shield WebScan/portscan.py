@@ -0,0 +1,164 @@
+"""Concurrent TCP connect scanner used by open_port_scan."""
+import asyncio
+import time
+
+from budget import allow_connect
+from metrics import record_connect
+
+# Most commonly open TCP ports, most frequent first
+TOP_PORTS = [
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723, 111, 995, 993, 5900,
+    1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000, 514, 5060, 179, 1026, 2000, 8443, 8000, 32768, 554,
+    26, 1433, 49152, 2001, 515, 8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081, 2049, 88, 79, 5800, 106,
+    2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144, 7, 389, 8009, 3128, 444, 9999, 5009,
+    7070, 5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051, 6646, 49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37,
+    6379, 27017, 9200, 11211, 5672, 9090, 8000, 8088, 1521, 2375, 5985, 6443, 9000, 9443, 15672, 50000,
+]
+TOP_PORTS = list(dict.fromkeys(TOP_PORTS))
+
+# Named port profiles; "top-N" and custom lists are handled by parse_ports
+PORT_PROFILES = {
+    "well-known": range(1, 1025),
+    "top": TOP_PORTS,
+    "default": sorted(set(range(1, 1025)) | set(TOP_PORTS)),
+    "full": range(1, 65536),
+}
+
+# Defaults for the scan engine
+DEFAULT_PORTS = PORT_PROFILES["default"]
+DEFAULT_CONCURRENCY = 256
+DEFAULT_TIMEOUT = 1.0
+# Lowest connect timeout the adaptive estimate may choose, in seconds
+MIN_TIMEOUT = 0.25
+
+
+def parse_ports(spec):
+    """Turn a profile name, "top-N" or a list like "22,80,8000-8100" into ports.
+
+    Raises ValueError for anything else.
+    """
+    spec = spec.strip().lower()
+    if spec in PORT_PROFILES:
+        return list(PORT_PROFILES[spec])
+    if spec.startswith("top-"):
+        count = int(spec[4:]) if spec[4:].isdigit() else 0
+        if count < 1:
+            raise ValueError(f"Invalid port profile: {spec}")
+        return TOP_PORTS[:count]
+
+    ports = set()
+    for part in spec.split(","):
+        low, dash, high = part.strip().partition("-")
+        if not low.isdigit() or (dash and not high.isdigit()):
+            raise ValueError(f"Invalid port list: {spec}")
+        low, high = int(low), int(high or low)
+        if not 1 <= low <= high <= 65535:
+            raise ValueError(f"Invalid port range: {part.strip()}")
+        ports.update(range(low, high + 1))
+    return sorted(ports)
+
+
+class AdaptiveTimeout:
+    """Connect timeout derived from the round-trip times seen so far.
+
+    Uses the TCP retransmission timeout estimator (RFC 6298): a smoothed RTT
+    plus four times its variance, scaled by `factor` and kept between
+    MIN_TIMEOUT and the configured maximum. Until the first answer (an
+    accept or a refusal) arrives, or when adaptive is off, the maximum is
+    used.
+    """
+
+    def __init__(self, maximum, factor=3, adaptive=True):
+        self.maximum = maximum
+        self.factor = factor
+        self.adaptive = adaptive
+        self.srtt = None
+        self.rttvar = None
+
+    def sample(self, rtt):
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    @property
+    def value(self):
+        if self.srtt is None or not self.adaptive:
+            return self.maximum
+        return min(self.maximum, max(MIN_TIMEOUT, self.factor * (self.srtt + 4 * self.rttvar)))
+
+
+async def _probe(host_ip, port, timeout, semaphore, limiter, deadline):
+    """Try a single TCP connect and return the port if it is open.
+
+    Once the scan's budget is spent or the deadline has passed, remaining
+    ports are skipped.
+    """
+    async with semaphore:
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        if not allow_connect():
+            return None
+        if limiter is not None:
+            await limiter.acquire_async()
+        started = time.monotonic()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host_ip, port), timeout.value)
+        except ConnectionRefusedError:
+            # A refusal is still a full round trip to the host
+            rtt = time.monotonic() - started
+            timeout.sample(rtt)
+            record_connect(host_ip, rtt, "closed")
+            if limiter is not None:
+                limiter.release(latency=rtt)
+            return None
+        except asyncio.TimeoutError:
+            # Filtered ports time out on healthy hosts too, so no signal
+            record_connect(host_ip, time.monotonic() - started, "filtered")
+            if limiter is not None:
+                limiter.release()
+            return None
+        except OSError:
+            record_connect(host_ip, time.monotonic() - started, "error")
+            if limiter is not None:
+                limiter.release(congested=True)
+            return None
+        rtt = time.monotonic() - started
+        timeout.sample(rtt)
+        record_connect(host_ip, rtt, "open")
+        if limiter is not None:
+            limiter.release(latency=rtt)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return port
+
+
+async def scan_ports_async(host_ip, ports=DEFAULT_PORTS, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                           adaptive=True, limiter=None, deadline=None):
+    """Connect to every port with at most `concurrency` attempts in flight.
+
+    With adaptive set, `timeout` is the upper bound and later connects wait
+    only as long as the host's measured round-trip time warrants. A
+    ratelimit.HostLimiter, if given, paces the connects further. Ports not
+    tried by deadline, a time.monotonic() value, are skipped.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    connect_timeout = AdaptiveTimeout(timeout, adaptive=adaptive)
+    found = await asyncio.gather(*(_probe(host_ip, port, connect_timeout, semaphore, limiter, deadline)
+                                   for port in ports))
+    return sorted(port for port in found if port is not None)
+
+
+def scan_ports(host_ip, ports=DEFAULT_PORTS, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, adaptive=True,
+               limiter=None, deadline=None):
+    """Return the sorted list of open TCP ports on host_ip (IPv4 or IPv6)."""
+    return asyncio.run(scan_ports_async(host_ip, ports, concurrency, timeout, adaptive, limiter, deadline))
+
+
+def worst_case_seconds(ports, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
+    """How long scanning ports can take when every connect waits the full timeout."""
+    return len(ports) / concurrency * timeout
@@ -0,0 +1,159 @@
+"""Per-host request pacing shared by every HTTP and socket check.
+
+Each host gets a token bucket that caps the request rate and an AIMD
+(additive increase, multiplicative decrease) concurrency window: the
+window grows by about one slot per window's worth of healthy responses
+and halves on timeouts, 429s and 5xx responses.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+
+from budget import charge_request, cut_off, request_timeout
+from fetch import HTTP_TIMEOUT
+from metrics import record_http
+
+# Per kind of traffic: requests per second, bucket size, and the starting,
+# smallest and largest concurrency window
+LIMITS = {
+    "http": {"rate": 20, "burst": 20, "initial": 4, "minimum": 1, "maximum": 32},
+    "connect": {"rate": 2000, "burst": 256, "initial": 256, "minimum": 8, "maximum": 512},
+}
+# A response slower than this multiple of the fastest one seen is not
+# "healthy" and does not grow the window
+SLOW_LATENCY_FACTOR = 3
+# Longest Retry-After pause honoured, in seconds
+MAX_RETRY_AFTER = 60
+# Hosts tracked before the least recently used is forgotten
+MAX_TRACKED_HOSTS = 10000
+# How often a caller waiting for a free slot checks again, in seconds
+SLOT_POLL_INTERVAL = 0.01
+
+
+class HostLimiter:
+    """Token bucket plus an AIMD concurrency window for one host."""
+
+    def __init__(self, rate, burst, initial, minimum, maximum):
+        self.rate = rate
+        self.burst = burst
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial)
+        self.tokens = float(burst)
+        self.in_flight = 0
+        self.fastest = None
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token and a slot if both are free, else return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.in_flight >= int(self.limit):
+                return SLOT_POLL_INTERVAL
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+            self.in_flight += 1
+            return 0
+
+    def acquire(self):
+        while (wait := self._reserve()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while (wait := self._reserve()) > 0:
+            await asyncio.sleep(wait)
+
+    def release(self, latency=None, congested=False, retry_after=None):
+        """Return a slot and adjust the window from how the request went.
+
+        Pass latency for a healthy completion, congested=True for a timeout,
+        429 or 5xx, and neither for an outcome that says nothing about load.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if congested:
+                self.limit = max(self.minimum, self.limit / 2)
+                if retry_after:
+                    self.paused_until = time.monotonic() + min(retry_after, MAX_RETRY_AFTER)
+            elif latency is not None:
+                if self.fastest is None or latency < self.fastest:
+                    self.fastest = latency
+                if latency <= self.fastest * SLOW_LATENCY_FACTOR:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+
+_limiters = OrderedDict()
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(host, kind="http"):
+    """Return the shared limiter for this host and kind of traffic."""
+    key = (host, kind)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = HostLimiter(**LIMITS[kind])
+            if len(_limiters) > MAX_TRACKED_HOSTS:
+                _limiters.popitem(last=False)
+        else:
+            _limiters.move_to_end(key)
+        return limiter
+
+
+def parse_retry_after(response):
+    """Seconds asked for by a Retry-After header, or None."""
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else None
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that paces every request through the host's limiter.
+
+    Requests sent without a timeout get HTTP_TIMEOUT, so a host that never
+    answers gives back its slot and shrinks its window. Timeouts are cut
+    down to the time the check and scan have left (budget.request_timeout).
+    """
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).hostname
+        charge_request()
+        limiter = limiter_for(host)
+        limiter.acquire()
+        # After the wait for a slot, so the timeout fits the time left
+        kwargs["timeout"] = request_timeout(kwargs.get("timeout") or HTTP_TIMEOUT)
+        started = time.monotonic()
+        try:
+            response = super().send(request, **kwargs)
+        except Timeout as e:
+            limiter.release(congested=not cut_off())
+            record_http(host, time.monotonic() - started, error=e)
+            raise
+        except ConnectionError as e:
+            limiter.release(congested=True)
+            record_http(host, time.monotonic() - started, error=e)
+            raise
+        except Exception as e:
+            limiter.release()
+            record_http(host, time.monotonic() - started, error=e)
+            raise
+
+        # Seconds to the headers, without the wait for a slot; sqli.py times probes by it
+        response.latency = time.monotonic() - started
+        record_http(host, response.latency, status=response.status_code)
+        if response.status_code == 429 or response.status_code >= 500:
+            limiter.release(congested=True, retry_after=parse_retry_after(response))
+        else:
+            limiter.release(latency=response.latency)
+        return response
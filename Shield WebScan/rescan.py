@@ -0,0 +1,95 @@
+"""State kept between scans of the same site, for cheap incremental rescans.
+
+PageStore remembers, per page, the validators (ETag, Last-Modified), a hash
+of the body, its links and the verdict for each form on it, so a rescan can
+send conditional requests and skip pages that have not changed.
+ScanHistory remembers the last results per target and reports what changed.
+Both keep their records in a cache.ResultCache.
+"""
+import json
+
+from crawler import normalize_url
+from findings import Change, Info, Note
+from scheduler import failed
+
+# Seconds page records and scan history are kept
+RESCAN_TTL = 30 * 24 * 3600
+CHANGES_SECTION = "changes since last scan"
+
+
+class PageStore:
+    """What the last scan saw on each crawled page."""
+
+    def __init__(self, cache, ttl=RESCAN_TTL):
+        self.cache = cache
+        self.ttl = ttl
+
+    def _key(self, url):
+        return json.dumps(["page", normalize_url(url)])
+
+    def get(self, url):
+        """The stored record for url, or None.
+
+        A record has "etag", "last_modified", "hash", "links" and
+        "verdicts" (form fingerprint JSON -> {"details", "lines"}, where
+        lines are the verdict's records as findings.dump gives them).
+        """
+        entry = self.cache.get(self._key(url))
+        return entry.value if entry is not None else None
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for a rescan of url."""
+        record = self.get(url)
+        headers = {}
+        if record is not None:
+            if record.get("etag"):
+                headers["If-None-Match"] = record["etag"]
+            if record.get("last_modified"):
+                headers["If-Modified-Since"] = record["last_modified"]
+        return headers
+
+    def save(self, url, record):
+        self.cache.set(self._key(url), record, self.ttl)
+
+
+class ScanHistory:
+    """The last results of every check for each target."""
+
+    def __init__(self, cache, ttl=RESCAN_TTL):
+        self.cache = cache
+        self.ttl = ttl
+
+    def _key(self, url):
+        return json.dumps(["history", normalize_url(url)])
+
+    def compare_and_save(self, url, results):
+        """Return the changes since the previous scan of url and store results.
+
+        Results are stored as their text lines, without Note records.
+        Checks that failed or timed out this time keep their previous results
+        and are left out of the comparison.
+        """
+        entry = self.cache.get(self._key(url))
+        previous = entry.value if entry is not None else None
+
+        saved = dict(previous or {})
+        for section, lines in results.items():
+            if not failed(lines):
+                saved[section] = [str(record) for record in lines if not isinstance(record, Note)]
+        self.cache.set(self._key(url), saved, self.ttl)
+
+        if previous is None:
+            return [Info("First scan of this target; nothing to compare yet.")]
+        return diff_results(previous, saved, results.keys())
+
+
+def diff_results(previous, current, sections):
+    """Change records for lines added ("+") and removed ("-") per section between two scans."""
+    changes = []
+    for section in sections:
+        if section not in previous or section not in current:
+            continue
+        old, new = previous[section], current[section]
+        changes.extend(Change(section, "+", line) for line in new if line not in old)
+        changes.extend(Change(section, "-", line) for line in old if line not in new)
+    return changes or [Info("No changes since the last scan.")]
@@ -0,0 +1,64 @@
+"""DNS resolution with a TTL-bounded cache shared by the network checks."""
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Seconds a successful / failed lookup is reused
+DNS_TTL = 300
+DNS_NEGATIVE_TTL = 30
+# Entries kept before the oldest are dropped
+DNS_CACHE_SIZE = 4096
+
+_cache = {}
+_cache_lock = threading.Lock()
+_reverse_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="reverse-dns")
+
+
+def _lookup(host):
+    """All IPv4 and IPv6 addresses for host, in the resolver's preferred order."""
+    addresses = []
+    for _, _, _, _, sockaddr in socket.getaddrinfo(host, None, type=socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses
+
+
+def _cached(key, lookup, *args):
+    """Run lookup(*args) once per TTL for key, sharing in-flight lookups."""
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] > now:
+            future = entry[1]
+            owner = False
+        else:
+            if len(_cache) >= DNS_CACHE_SIZE:
+                del _cache[next(iter(_cache))]
+            future = Future()
+            _cache[key] = (now + DNS_TTL, future)
+            owner = True
+
+    if owner:
+        try:
+            future.set_result(lookup(*args))
+        except Exception as e:
+            future.set_exception(e)
+            with _cache_lock:
+                _cache[key] = (now + DNS_NEGATIVE_TTL, future)
+    return future.result()
+
+
+def resolve(host):
+    """Return every address of host (IPv4 and IPv6), resolving at most once per TTL."""
+    return _cached(("forward", host), _lookup, host)
+
+
+def reverse_lookup(ip):
+    """Return the host name for ip, resolving at most once per TTL."""
+    return _cached(("reverse", ip), lambda address: socket.gethostbyaddr(address)[0], ip)
+
+
+def reverse_lookup_async(ip):
+    """Start reverse_lookup(ip) in the background and return its Future."""
+    return _reverse_executor.submit(reverse_lookup, ip)
@@ -0,0 +1,223 @@
+"""Run the /scan checks concurrently, each with its own deadline."""
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from budget import STOP_GRACE_SECONDS
+from findings import Note, Partial, Problem, dump, load
+from metrics import Scope, record_check, run_in_scope, run_in_scope_async
+
+# Shared pool for check functions; checks are I/O bound
+MAX_CHECK_WORKERS = 64
+# Seconds between looks at a scan budget that may run out mid-wait
+BUDGET_POLL_INTERVAL = 0.5
+_executor = ThreadPoolExecutor(max_workers=MAX_CHECK_WORKERS, thread_name_prefix="check")
+
+
+class Check:
+    """One named check: func(*args) with a deadline in seconds.
+
+    A check with a cache_key has its results cached for ttl seconds when
+    run_checks is given a cache. target is the host the check is about, used
+    to label its metrics.
+    """
+
+    def __init__(self, name, func, args=(), deadline=30, cache_key=None, ttl=None, target=None):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.deadline = deadline
+        self.cache_key = cache_key
+        self.ttl = ttl
+        self.target = target
+
+
+def failed(result):
+    """True if result is incomplete: a partial result, or the report run_checks
+    substitutes for a check that timed out, raised or was stopped."""
+    if any(isinstance(record, Partial) for record in result):
+        return True
+    return len(result) == 1 and isinstance(result[0], Problem) \
+        and result[0].text.startswith(("Check timed out", "Error running check", "Check stopped"))
+
+
+def _format_age(seconds):
+    if seconds < 120:
+        return f"{int(seconds)} seconds"
+    if seconds < 7200:
+        return f"{int(seconds // 60)} minutes"
+    return f"{int(seconds // 3600)} hours"
+
+
+def _from_cache(checks, cache, scopes, record):
+    """Record cached results and return the checks that still need to run."""
+    to_run = []
+    for check in checks:
+        entry = cache.get(check.cache_key) if cache is not None and check.cache_key else None
+        if entry is None:
+            to_run.append(check)
+        elif entry.fresh:
+            scopes[check.name].outcome = "cached"
+            record_check(check.name, "cached")
+            record(check, load(entry.value))
+        else:
+            record(check, [Note(f"Cached result from {_format_age(entry.age)} ago, refreshing...")] + load(entry.value))
+            to_run.append(check)
+    return to_run
+
+
+def _complete(check, result, scope, cache, budget):
+    """Mark result partial if the scan's budget cut the check short; otherwise cache it.
+
+    A check was cut short if the budget refused it a request, or if it
+    reported an error once the budget had run out, e.g. because a page it
+    shares with another check could not be fetched. A check refused a
+    connect ran out of the connect allowance, which leaves the others be.
+    """
+    if budget is not None and budget.exhausted() is not None \
+            and (scope.denied or any(isinstance(record, Problem) for record in result)):
+        return result + [Partial(budget.reason)]
+    if budget is not None and budget.connects_spent and scope.denied:
+        return result + [Partial("connect")]
+    if cache is not None and check.cache_key and not any(isinstance(record, Partial) for record in result):
+        cache.set(check.cache_key, dump(result), check.ttl)
+    return result
+
+
+def _wait_timeout(pending_checks, started, budget):
+    """Seconds until the next check deadline, or until the budget needs another look."""
+    now = time.monotonic()
+    timeout = min(check.deadline for check in pending_checks) - (now - started)
+    if budget is not None:
+        if budget.exhausted() is None:
+            timeout = min(timeout, BUDGET_POLL_INTERVAL)
+        else:
+            timeout = min(timeout, budget.spent_at + STOP_GRACE_SECONDS - now)
+    return max(timeout, 0)
+
+
+def _stopped(budget):
+    """True once the budget is spent and the checks' grace period is over."""
+    return budget is not None and budget.exhausted() is not None \
+        and time.monotonic() >= budget.spent_at + STOP_GRACE_SECONDS
+
+
+def run_checks(checks, on_result=None, cache=None, timings=None, budget=None):
+    """Run checks in parallel and return their results in declaration order.
+
+    on_result(name, result) is called as each check finishes or times out.
+    A check that is still running at its deadline is reported as timed out
+    and left to finish in the background; its result is discarded.
+
+    With a cache, checks with a fresh cached result are not run at all. A
+    stale cached result is reported straight away through on_result and
+    the check runs again to replace it.
+
+    If timings is a dict, it is filled with a metrics.Scope summary per
+    check: outcome, seconds, requests, errors, bytes and connects.
+
+    With a budget.ScanBudget, every check draws on it. Once it runs out,
+    checks still running get STOP_GRACE_SECONDS to return what they have,
+    which is marked partial and not cached; checks still running after
+    that are reported as stopped.
+    """
+    started = time.monotonic()
+    results = {}
+    if budget is not None:
+        budget.start()
+    scopes = {check.name: Scope(check.name, check.target, budget, started + check.deadline) for check in checks}
+
+    def record(check, result):
+        results[check.name] = result
+        if on_result is not None:
+            on_result(check.name, result)
+
+    to_run = _from_cache(checks, cache, scopes, record)
+    pending = {_executor.submit(run_in_scope, scopes[check.name], check.func, *check.args): check
+               for check in to_run}
+    while pending:
+        timeout = _wait_timeout(pending.values(), started, budget)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            check = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                record(check, [Problem(f"Error running check: {str(e)}")])
+                continue
+            record(check, _complete(check, result, scopes[check.name], cache, budget))
+
+        elapsed = time.monotonic() - started
+        for future, check in list(pending.items()):
+            if elapsed >= check.deadline:
+                del pending[future]
+                future.cancel()
+                scopes[check.name].outcome = "timeout"
+                scopes[check.name].seconds = elapsed
+                record_check(check.name, "timeout")
+                record(check, [Problem(f"Check timed out after {check.deadline} seconds.")])
+            elif _stopped(budget):
+                del pending[future]
+                future.cancel()
+                scopes[check.name].outcome = "stopped"
+                scopes[check.name].seconds = elapsed
+                record_check(check.name, "stopped")
+                record(check, [Problem(f"Check stopped: the scan's {budget.reason} budget ran out.")])
+
+    if timings is not None:
+        timings.update((check.name, scopes[check.name].to_dict()) for check in checks)
+    return {check.name: results[check.name] for check in checks}
+
+
+async def run_checks_async(checks, on_result=None, cache=None, timings=None, budget=None):
+    """Run checks whose funcs are coroutine functions as tasks on the running loop.
+
+    Behaves like run_checks, except that a check still running at its
+    deadline, or when it is stopped, is cancelled rather than left to finish.
+    """
+    started = time.monotonic()
+    results = {}
+    if budget is not None:
+        budget.start()
+    scopes = {check.name: Scope(check.name, check.target, budget, started + check.deadline) for check in checks}
+
+    def record(check, result):
+        results[check.name] = result
+        if on_result is not None:
+            on_result(check.name, result)
+
+    to_run = _from_cache(checks, cache, scopes, record)
+    pending = {asyncio.ensure_future(run_in_scope_async(scopes[check.name], check.func, *check.args)): check
+               for check in to_run}
+    while pending:
+        timeout = _wait_timeout(pending.values(), started, budget)
+        done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            check = pending.pop(task)
+            try:
+                result = task.result()
+            except Exception as e:
+                record(check, [Problem(f"Error running check: {str(e)}")])
+                continue
+            record(check, _complete(check, result, scopes[check.name], cache, budget))
+
+        elapsed = time.monotonic() - started
+        for task, check in list(pending.items()):
+            if elapsed >= check.deadline:
+                del pending[task]
+                scopes[check.name].outcome = "timeout"
+                scopes[check.name].seconds = elapsed
+                record_check(check.name, "timeout")
+                task.cancel()
+                record(check, [Problem(f"Check timed out after {check.deadline} seconds.")])
+            elif _stopped(budget):
+                del pending[task]
+                scopes[check.name].outcome = "stopped"
+                scopes[check.name].seconds = elapsed
+                record_check(check.name, "stopped")
+                task.cancel()
+                record(check, [Problem(f"Check stopped: the scan's {budget.reason} budget ran out.")])
+
+    if timings is not None:
+        timings.update((check.name, scopes[check.name].to_dict()) for check in checks)
+    return {check.name: results[check.name] for check in checks}
@@ -0,0 +1,387 @@
+"""URL seeds for the crawl from robots.txt and the sitemaps it lists.
+
+robots.txt is parsed into its user-agent groups (RFC 9309): Allow and
+Disallow rules with * and $ patterns, where the longest matching rule
+wins, plus the file's Sitemap lines. seed_urls then walks those sitemaps,
+following sitemap indexes, and yields the page URLs they list as they are
+read. Sitemaps are streamed and parsed incrementally, gzipped or not, so
+only the entry being parsed is held in memory however large the file.
+"""
+import re
+import zlib
+from collections import deque
+from urllib.parse import urljoin, urlsplit
+from xml.etree.ElementTree import ParseError, XMLParser
+
+from aiofetch import fetch_page_async, stream as aio_stream
+from budget import BudgetExhausted, exhausted
+from crawler import normalize_url
+from fetch import BODY_CHUNK_SIZE, HTTP_TIMEOUT, fetch_page
+from metrics import record_bytes
+
+# Product token whose robots.txt group applies to the seeds; groups for
+# "*" apply when none names it
+ROBOTS_AGENT = "shield-webscan"
+# Bytes of robots.txt read, the minimum RFC 9309 asks parsers to handle
+ROBOTS_MAX_BYTES = 500 * 1024
+# Page URLs yielded, and sitemap files fetched (indexes included), per crawl
+SEED_MAX_URLS = 1000
+SITEMAP_MAX_FILES = 20
+# Uncompressed bytes parsed per sitemap, the sitemap protocol's own limit
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+
+_DIRECTIVE = re.compile(r"^\s*([A-Za-z-]+)\s*:\s*(.*?)\s*$")
+
+
+class RobotsTxt:
+    """The user-agent groups and Sitemap lines of one robots.txt.
+
+    `groups` is a list of (agents, rules), agents being lower-cased product
+    tokens and rules (allow, path) pairs in file order.
+    """
+
+    def __init__(self, groups=(), sitemaps=()):
+        self.groups = list(groups)
+        self.sitemaps = list(sitemaps)
+        self._compiled = {}
+
+    @property
+    def disallowed(self):
+        """Every Disallow path in the file, in order and without repeats."""
+        return self._paths(False)
+
+    @property
+    def allowed(self):
+        """Every Allow path in the file, in order and without repeats."""
+        return self._paths(True)
+
+    def _paths(self, allow):
+        paths = {}
+        for _, rules in self.groups:
+            for rule_allow, path in rules:
+                if rule_allow == allow:
+                    paths[path] = None
+        return list(paths)
+
+    def rules_for(self, agent):
+        """The rules of every group naming agent, or else of every "*" group."""
+        for token in (agent.lower(), "*"):
+            groups = [group_rules for agents, group_rules in self.groups if token in agents]
+            if groups:
+                return [rule for group_rules in groups for rule in group_rules]
+        return []
+
+    def can_fetch(self, url, agent=ROBOTS_AGENT):
+        """Whether agent may fetch url: the longest matching rule decides, Allow winning ties."""
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        if path == "/robots.txt":
+            return True
+        best = None
+        for allow, pattern in self.rules_for(agent):
+            if self._pattern(pattern).match(path):
+                if best is None or (len(pattern), allow) > (len(best[1]), best[0]):
+                    best = (allow, pattern)
+        return best is None or best[0]
+
+    def _pattern(self, pattern):
+        regex = self._compiled.get(pattern)
+        if regex is None:
+            anchored = pattern.endswith("$")
+            body = ".*".join(re.escape(part) for part in pattern.rstrip("$").split("*"))
+            regex = self._compiled[pattern] = re.compile(body + (r"\Z" if anchored else ""))
+        return regex
+
+
+def parse_robots(text):
+    """Parse robots.txt text (str or bytes) into a RobotsTxt.
+
+    User-agent lines in a row open one group; the rules after them belong
+    to it until the next User-agent line. An empty Disallow allows
+    everything and is dropped. Sitemap lines count wherever they appear.
+    """
+    if isinstance(text, bytes):
+        text = text.decode("utf-8", "replace")
+    groups = []
+    sitemaps = []
+    rules = None
+    # Whether the current group has had a rule line, so the next User-agent opens a new one
+    in_rules = True
+    for line in text.splitlines():
+        match = _DIRECTIVE.match(line.split("#", 1)[0])
+        if not match:
+            continue
+        key, value = match.group(1).lower(), match.group(2)
+        if key == "user-agent":
+            if in_rules:
+                agents, rules = [], []
+                groups.append((agents, rules))
+                in_rules = False
+            agents.append(value.lower())
+        elif key in ("allow", "disallow"):
+            if rules is not None:
+                in_rules = True
+                if value:
+                    rules.append((key == "allow", value))
+        elif key == "sitemap" and value:
+            sitemaps.append(value)
+    return RobotsTxt(groups, sitemaps)
+
+
+def load_robots(page):
+    """The RobotsTxt of a fetched /robots.txt page; empty if it is missing or failed."""
+    try:
+        if page.status_code == 200:
+            return parse_robots(page.content)
+    except Exception:
+        pass
+    return RobotsTxt()
+
+
+class _SitemapTarget:
+    """XMLParser target that keeps each entry's <loc> text and no tree at all."""
+
+    def __init__(self):
+        self.entries = []
+        self._loc = None
+        self._text = None
+
+    def start(self, tag, attrib):
+        # The first <loc> is the entry's own; extensions such as image:loc come later
+        if self._loc is None and tag.rpartition("}")[2] == "loc":
+            self._text = []
+
+    def data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def end(self, tag):
+        name = tag.rpartition("}")[2]
+        if name == "loc" and self._text is not None:
+            self._loc = "".join(self._text).strip()
+            self._text = None
+        elif name in ("url", "sitemap"):
+            if self._loc:
+                self.entries.append((name, self._loc))
+            self._loc = None
+
+    def close(self):
+        pass
+
+
+class SitemapParser:
+    """Incremental parser for one sitemap, fed its body a chunk at a time.
+
+    Reads XML urlsets and sitemap indexes, plain-text sitemaps (one URL
+    per line) and gzip files. feed() returns the (kind, url) entries the
+    chunk completed, kind being "url" or "sitemap". `done` is set once the
+    byte cap is reached or the file turns out to be malformed; what was
+    parsed until then is kept.
+    """
+
+    def __init__(self, max_bytes=SITEMAP_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.done = False
+        self._started = False
+        self._gunzip = None
+        self._xml = None
+        self._text = None
+
+    def feed(self, chunk):
+        entries = []
+        if self.done or not chunk:
+            return entries
+        if not self._started:
+            self._started = True
+            if chunk[:2] == b"\x1f\x8b":
+                self._gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._gunzip is None:
+            self._parse(chunk, entries)
+            return entries
+        try:
+            # Inflate at most a chunk at a time so a small file cannot expand all at once
+            while chunk and not self.done:
+                self._parse(self._gunzip.decompress(chunk, BODY_CHUNK_SIZE), entries)
+                chunk = self._gunzip.unconsumed_tail
+        except zlib.error:
+            self.done = True
+        return entries
+
+    def close(self):
+        """Return the entries completed by the end of the file."""
+        entries = []
+        if self._text:
+            self._line(self._text, entries)
+            self._text = None
+        if self._xml is not None and not self.done:
+            try:
+                self._xml.close()
+            except ParseError:
+                pass
+            entries.extend(self._xml.target.entries)
+        self.done = True
+        return entries
+
+    def _parse(self, data, entries):
+        if not data or self.done:
+            return
+        data = data[:self.max_bytes - self.size]
+        self.size += len(data)
+        self.done = self.size >= self.max_bytes
+        if self._xml is None and self._text is None:
+            # XML may not have anything before its declaration
+            data = data.lstrip(b"\xef\xbb\xbf \t\r\n")
+            if not data:
+                return
+            if data.startswith(b"<"):
+                self._xml = XMLParser(target=_SitemapTarget())
+            else:
+                self._text = b""
+        if self._xml is not None:
+            self._parse_xml(data, entries)
+        else:
+            *lines, self._text = (self._text + data).split(b"\n")
+            for line in lines:
+                self._line(line, entries)
+
+    def _parse_xml(self, data, entries):
+        try:
+            self._xml.feed(data)
+        except ParseError:
+            self.done = True
+        target = self._xml.target
+        entries.extend(target.entries)
+        target.entries = []
+
+    def _line(self, line, entries):
+        line = line.strip().decode("utf-8", "replace")
+        if line.startswith(("http://", "https://")):
+            entries.append(("url", line))
+
+
+class _Seeds:
+    """Bookkeeping shared by seed_urls and seed_urls_async."""
+
+    def __init__(self, url, robots, max_urls, max_sitemaps, agent):
+        self.host = urlsplit(url).hostname
+        self.origin = urlsplit(normalize_url(url))[:2]
+        self.robots = robots
+        self.agent = agent
+        self.max_urls = max_urls
+        self.fetches_left = max_sitemaps
+        self.yielded = set()
+        self.sitemaps = deque()
+        self.queued = set()
+        for sitemap in robots.sitemaps or [urljoin(url, "/sitemap.xml")]:
+            self.queue_sitemap(urljoin(url, sitemap))
+
+    @property
+    def full(self):
+        return len(self.yielded) >= self.max_urls
+
+    def queue_sitemap(self, sitemap):
+        # Sitemaps on other hosts are out of the scan's scope
+        if urlsplit(sitemap).hostname != self.host:
+            return
+        key = normalize_url(sitemap)
+        if key not in self.queued:
+            self.queued.add(key)
+            self.sitemaps.append(sitemap)
+
+    def next_sitemap(self):
+        """The next sitemap to read, or None when done."""
+        if self.full or not self.sitemaps or self.fetches_left <= 0 or exhausted():
+            return None
+        self.fetches_left -= 1
+        return self.sitemaps.popleft()
+
+    def add(self, entries):
+        """Queue the sitemaps among entries and return the new page URLs to yield."""
+        pages = []
+        for kind, loc in entries:
+            if kind == "sitemap":
+                self.queue_sitemap(loc)
+                continue
+            if self.full:
+                break
+            if urlsplit(loc).scheme not in ("http", "https"):
+                continue
+            page = normalize_url(loc)
+            if page in self.yielded or urlsplit(page)[:2] != self.origin:
+                continue
+            if self.agent is not None and not self.robots.can_fetch(page, self.agent):
+                continue
+            self.yielded.add(page)
+            pages.append(page)
+        return pages
+
+
+def seed_urls(url, session, robots_page=None, max_urls=SEED_MAX_URLS, max_sitemaps=SITEMAP_MAX_FILES,
+              agent=ROBOTS_AGENT):
+    """Yield the same-origin page URLs listed in url's sitemaps, as they are read.
+
+    Sitemaps are those named in robots.txt, or /sitemap.xml if it names
+    none; indexes are followed breadth-first, and only sitemaps on the
+    target's host are fetched. URLs are normalized and yielded once each,
+    at most max_urls of them, skipping any robots.txt disallows for agent
+    (None to keep them). robots_page is the /robots.txt page if it was
+    fetched already.
+
+    Nothing is requested until the first URL is asked for, and reading
+    stops when the consumer does or the scan's budget is spent. Close the
+    generator to release a sitemap it is part way through.
+    """
+    if robots_page is None:
+        robots_page = fetch_page(urljoin(url, "/robots.txt"), session, max_bytes=ROBOTS_MAX_BYTES)
+    seeds = _Seeds(url, load_robots(robots_page), max_urls, max_sitemaps, agent)
+    while (sitemap := seeds.next_sitemap()) is not None:
+        parser = SitemapParser()
+        host = urlsplit(sitemap).hostname
+        try:
+            response = session.get(sitemap, stream=True, timeout=HTTP_TIMEOUT)
+        except BudgetExhausted:
+            return
+        except Exception:
+            continue
+        try:
+            if response.status_code != 200:
+                continue
+            for chunk in response.iter_content(BODY_CHUNK_SIZE):
+                record_bytes(host, len(chunk))
+                yield from seeds.add(parser.feed(chunk))
+                if parser.done or seeds.full or exhausted():
+                    break
+            yield from seeds.add(parser.close())
+        except Exception:
+            continue
+        finally:
+            response.close()
+
+
+async def seed_urls_async(url, client, robots_page=None, max_urls=SEED_MAX_URLS, max_sitemaps=SITEMAP_MAX_FILES,
+                          agent=ROBOTS_AGENT):
+    """Async generator counterpart of seed_urls; robots_page is an aiofetch.AsyncPage."""
+    if robots_page is None:
+        robots_page = fetch_page_async(urljoin(url, "/robots.txt"), client, max_bytes=ROBOTS_MAX_BYTES)
+    await robots_page.load()
+    seeds = _Seeds(url, load_robots(robots_page), max_urls, max_sitemaps, agent)
+    while (sitemap := seeds.next_sitemap()) is not None:
+        parser = SitemapParser()
+        host = urlsplit(sitemap).hostname
+        try:
+            async with aio_stream(client, "GET", sitemap) as response:
+                if response.status != 200:
+                    continue
+                async for chunk in response.content.iter_chunked(BODY_CHUNK_SIZE):
+                    record_bytes(host, len(chunk))
+                    for page in seeds.add(parser.feed(chunk)):
+                        yield page
+                    if parser.done or seeds.full or exhausted():
+                        break
+                for page in seeds.add(parser.close()):
+                    yield page
+        except BudgetExhausted:
+            return
+        except Exception:
+            continue
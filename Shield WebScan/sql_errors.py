@@ -0,0 +1,130 @@
+"""DBMS error signatures used to spot error-based SQL injection.
+
+All signatures are compiled into one bytes regex with a named group per
+DBMS, so the group that matched tells which engine produced the error.
+Matching is case-insensitive: the body is lowercased once and the
+signatures are compiled in lowercase. The body is never decoded, so
+non-UTF-8 pages are fine.
+
+Python's re engine tries every branch of a large alternation at every
+byte, so running the regex over a whole page is slow. Instead the body is
+lowercased once and searched for a handful of literal "hub" words that
+every signature contains; the regex only runs on a small window around
+each hub hit.
+"""
+import re
+
+# Error messages by DBMS. Wildcards are bounded so a pattern can never scan
+# far past the point where it started matching.
+SQL_ERROR_SIGNATURES = {
+    "MySQL": [
+        r"you have an error in your SQL syntax",
+        r"check the manual that (?:corresponds|fits) to your (?:MySQL|MariaDB) server version",
+        r"SQL syntax.{0,100}?MySQL",
+        r"Warning.{0,100}?\Wmysqli?_",
+        r"MySQLSyntaxErrorException",
+        r"valid MySQL result",
+        r"Unknown column '[^']{1,100}' in '(?:field list|where clause)'",
+        r"com\.mysql\.jdbc",
+    ],
+    "PostgreSQL": [
+        r"PostgreSQL.{0,100}?ERROR",
+        r"Warning.{0,100}?\Wpg_",
+        r"valid PostgreSQL result",
+        r"Npgsql\.",
+        r"PG::SyntaxError:",
+        r"org\.postgresql\.util\.PSQLException",
+        r"ERROR:\s+syntax error at or near",
+        r"unterminated quoted string at or near",
+    ],
+    "MSSQL": [
+        r"unclosed quotation mark after the character string",
+        r"Driver.{0,100}? SQL[\-_ ]*Server",
+        r"OLE DB.{0,100}? SQL Server",
+        r"Warning.{0,100}?\W(?:mssql|sqlsrv)_",
+        r"System\.Data\.SqlClient\.SqlException",
+        r"Microsoft SQL Native Client error '[0-9a-f]{8}",
+        r"\[SQL Server\]",
+        r"com\.microsoft\.sqlserver\.jdbc",
+        r"Incorrect syntax near",
+    ],
+    "Oracle": [
+        r"quoted string not properly terminated",
+        r"SQL command not properly ended",
+        r"\bORA-\d{5}",
+        r"Oracle error",
+        r"Oracle.{0,100}?Driver",
+        r"Warning.{0,100}?\W(?:oci|ora)_",
+        r"oracle\.jdbc",
+    ],
+    "SQLite": [
+        r"SQLite/JDBCDriver",
+        r"SQLite\.Exception",
+        r"System\.Data\.SQLite\.SQLiteException",
+        r"Warning.{0,100}?\W(?:sqlite_|SQLite3::)",
+        r"\[SQLITE_ERROR\]",
+        r"SQLite error \d+:",
+        r"sqlite3\.OperationalError:",
+        r"SQLite3::SQLException",
+        r"unrecognized token: \"",
+    ],
+    "IBM DB2": [
+        r"CLI Driver.{0,100}?DB2",
+        r"DB2 SQL error",
+        r"\bdb2_\w+\(",
+        r"SQLSTATE=\d{5}",
+    ],
+    "Microsoft Access": [
+        r"Microsoft Access (?:\d+ )?Driver",
+        r"JET Database Engine",
+        r"Access Database Engine",
+        r"Syntax error \(missing operator\) in query expression",
+    ],
+}
+
+
+# Every signature must contain at least one of these (lowercase) words
+HUB_WORDS = (
+    b"sql", b"syntax", b"quot", b"warning", b"ora-", b"oracle", b"db2",
+    b"unknown column", b"unrecognized token", b"database engine", b"microsoft access",
+)
+# Bytes searched either side of a hub hit; covers the longest signature
+WINDOW = 160
+# Hub hits verified per word before giving up on that word
+MAX_HITS_PER_WORD = 32
+
+
+def _lowercase(pattern):
+    """Lowercase the literal characters of a pattern, leaving escapes alone."""
+    return re.sub(r"\\.|[A-Z]", lambda m: m.group() if m.group().startswith("\\") else m.group().lower(), pattern)
+
+
+def _compile(signatures):
+    groups = {}
+    alternatives = []
+    for index, (dbms, patterns) in enumerate(signatures.items()):
+        for pattern in patterns:
+            if not any(word.decode() in pattern.lower() for word in HUB_WORDS):
+                raise ValueError(f"SQL error signature {pattern!r} contains no hub word")
+        group = f"dbms{index}"
+        groups[group] = dbms
+        alternatives.append(f"(?P<{group}>{'|'.join(_lowercase(pattern) for pattern in patterns)})")
+    return re.compile("|".join(alternatives).encode()), groups
+
+
+_matcher, _group_names = _compile(SQL_ERROR_SIGNATURES)
+
+
+def match_sql_error(body):
+    """Return the DBMS whose error message appears in body (bytes), or None."""
+    lowered = body.lower()
+    for word in HUB_WORDS:
+        position = lowered.find(word)
+        hits = 0
+        while position != -1 and hits < MAX_HITS_PER_WORD:
+            match = _matcher.search(lowered, max(position - WINDOW, 0), position + WINDOW)
+            if match is not None:
+                return _group_names[match.lastgroup]
+            position = lowered.find(word, position + WINDOW)
+            hits += 1
+    return None
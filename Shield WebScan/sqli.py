@@ -0,0 +1,286 @@
+"""Differential SQL injection detection for one form.
+
+Every form is first submitted as it is, to get a baseline response; the
+baseline is kept in a cache.ResultCache so a rescan soon after does not
+fetch it again. Each payload response is then compared with the baseline,
+cheapest signal first: status code, then a hash of the normalized body,
+then its length, and only when those disagree a similarity ratio over
+hashed segments of the body. Normalizing blanks out the submitted values
+wherever the page echoes them, and numbers and token-like strings, so
+those alone do not make two responses differ.
+
+Probes run in stages and stop at the first finding:
+  error    a lone quote, looking for a DBMS error (sql_errors.py) that the
+           baseline does not show
+  boolean  for quotes that changed the response: an always-true condition
+           must look like the baseline and an always-false one must not,
+           twice with fresh values
+  time     for those same quotes: a sleep payload per DBMS must be slower
+           than the form's normal latency by a margin calibrated from the
+           responses so far, a zero sleep must not be, and a second sleep
+           must be slow again
+
+A form whose responses do not change under a quote costs three requests,
+or two with a cached baseline.
+"""
+import hashlib
+import html
+import json
+import math
+import random
+import re
+import statistics
+import zlib
+from collections import Counter
+from urllib.parse import quote as url_quote, quote_plus
+
+from findings import FetchFailed, Info, SqlInjection
+from sql_errors import match_sql_error
+
+# Responses at least this alike are "the same page"
+SIMILARITY_THRESHOLD = 0.95
+# Normalized bodies whose lengths differ by more than this factor are
+# different without a closer look
+LENGTH_FACTOR = 2
+# Body segments hashed for the similarity ratio
+MAX_SEGMENTS = 2000
+# Seconds a form's baseline is reused
+BASELINE_TTL = 600
+
+QUOTES = ('"', "'")
+# Always-true/always-false pairs sent per quote
+BOOLEAN_ROUNDS = 2
+# Sleep payloads by DBMS, for string (quoted) and numeric contexts
+TIME_PAYLOADS = {
+    "MySQL": ("{q} AND SLEEP({d}) AND {q}1{q}={q}1", " AND SLEEP({d})"),
+    "PostgreSQL": ("{q} AND 1=(SELECT 1 FROM PG_SLEEP({d})) AND {q}1{q}={q}1", " AND 1=(SELECT 1 FROM PG_SLEEP({d}))"),
+    "MSSQL": ("{q}; WAITFOR DELAY '0:0:{d}'--", "; WAITFOR DELAY '0:0:{d}'--"),
+}
+# The sleep is at least TIME_MIN_DELAY seconds and twice the spread of
+# normal latencies (TIME_DEVIATIONS standard deviations); forms too noisy
+# for TIME_MAX_DELAY are not time-probed
+TIME_DEVIATIONS = 7
+TIME_MIN_DELAY = 2
+TIME_MAX_DELAY = 8
+# Time-probe every form, not only those a quote changed; finds fully blind
+# injections at up to six more requests per form
+TIME_PROBE_ALL_FORMS = False
+
+_DYNAMIC = re.compile(rb"[0-9a-f]{16,}|[A-Za-z0-9+/_-]{32,}={0,2}|\d+", re.I)
+_SPACE = re.compile(rb"\s+")
+_SEGMENT = re.compile(rb"[<\n]")
+
+
+def injection_data(details, suffix):
+    """Form fields for one request, with suffix appended to each value.
+
+    Fields without a name are left out, as browsers do.
+    """
+    data = {}
+    for input_tag in details["inputs"]:
+        if input_tag["name"] is None:
+            continue
+        if input_tag["type"] == "hidden" or input_tag["value"]:
+            data[input_tag['name']] = input_tag["value"] + suffix
+        elif input_tag["type"] != "submit":
+            data[input_tag['name']] = f"test{suffix}"
+    return data
+
+
+def _reflections(values):
+    """Byte strings the page may echo the submitted values as, longest first."""
+    variants = set()
+    for value in values:
+        if len(value) < 4:
+            continue
+        escaped = html.escape(value)
+        for variant in (value, escaped, escaped.replace("&#x27;", "&#39;"), html.escape(value, quote=False),
+                        quote_plus(value), url_quote(value)):
+            variants.add(variant.encode())
+    return sorted(variants, key=len, reverse=True)
+
+
+def normalize(content, values=()):
+    """The body with echoed values, numbers and token-like strings blanked out."""
+    for variant in _reflections(values):
+        content = content.replace(variant, b"")
+    return _SPACE.sub(b" ", _DYNAMIC.sub(b"0", content))
+
+
+class Signature:
+    """What one response looked like: cheap signals, latency and, on demand, segment hashes."""
+
+    __slots__ = ("status", "length", "digest", "latency", "dbms", "_body", "_segments")
+
+    def __init__(self, status, length, digest, latency=None, dbms=None, body=None, segments=None):
+        self.status = status
+        self.length = length
+        self.digest = digest
+        self.latency = latency
+        self.dbms = dbms
+        self._body = body
+        self._segments = segments
+
+    @classmethod
+    def of(cls, response, values=()):
+        """The signature of a response to a request that sent values."""
+        body = normalize(response.content, values)
+        return cls(response.status_code, len(body), hashlib.blake2b(body, digest_size=16).hexdigest(),
+                   getattr(response, "latency", None), match_sql_error(response.content), body)
+
+    @property
+    def segments(self):
+        """Counts of the CRC32s of the body's tag- and line-separated segments."""
+        if self._segments is None:
+            parts = _SEGMENT.split(self._body or b"")
+            self._segments = Counter(zlib.crc32(part) for part in parts[:MAX_SEGMENTS] if part.strip())
+            self._body = None
+        return self._segments
+
+    def to_dict(self):
+        return {"status": self.status, "length": self.length, "digest": self.digest, "latency": self.latency,
+                "dbms": self.dbms, "segments": [[crc, count] for crc, count in self.segments.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["status"], data["length"], data["digest"], data["latency"], data["dbms"],
+                   segments=Counter(dict(map(tuple, data["segments"]))))
+
+
+def similarity(a, b):
+    """How alike two signatures are, from 0 to 1; the segments are only compared when the cheap signals disagree."""
+    if a.status != b.status:
+        return 0.0
+    if a.digest == b.digest:
+        return 1.0
+    if max(a.length, b.length) > LENGTH_FACTOR * max(min(a.length, b.length), 1):
+        return 0.0
+    common = sum((a.segments & b.segments).values())
+    return common / max(sum(a.segments.values()), sum(b.segments.values()), 1)
+
+
+def alike(a, b):
+    return similarity(a, b) >= SIMILARITY_THRESHOLD
+
+
+class FormTester:
+    """Decides whether one form is injectable, sharing its logic between the sync and async drivers.
+
+    plan() is a generator that yields the form data of each request to send
+    and must be sent back the response (anything with status_code, content
+    and optionally latency, the seconds to its headers). Its return value
+    is the form's result records. `baseline` is a cached Signature, or None
+    to fetch one; afterwards `fetched_baseline` says whether to store it.
+    """
+
+    def __init__(self, action_url, details, baseline=None):
+        self.action_url = action_url
+        self.details = details
+        self.original = injection_data(details, "")
+        self.baseline = baseline
+        self.fetched_baseline = False
+        # Latencies of responses without a sleep, for calibrating time probes
+        self.latencies = [] if baseline is None or baseline.latency is None else [baseline.latency]
+
+    def _signature(self, response, data):
+        # The original values are blanked too, so the baseline and the probes lose the same text
+        return Signature.of(response, list(data.values()) + list(self.original.values()))
+
+    def _send(self, suffix):
+        """Send the form with suffix appended to its values and return the response's signature."""
+        data = injection_data(self.details, suffix)
+        return self._signature((yield data), data)
+
+    def plan(self):
+        if self.baseline is None:
+            self.baseline = self._signature((yield self.original), self.original)
+            self.fetched_baseline = True
+            self.latencies.append(self.baseline.latency)
+        if self.baseline.status != 200:
+            return [FetchFailed(self.action_url)]
+
+        changed = []
+        for quote in QUOTES:
+            probe = yield from self._send(quote)
+            self.latencies.append(probe.latency)
+            if probe.dbms and probe.dbms != self.baseline.dbms:
+                return [SqlInjection(self.action_url, probe.dbms)]
+            if not alike(probe, self.baseline):
+                changed.append(quote)
+
+        # Numeric fields break under any quote and need no quote of their own
+        numeric = any(value.isdigit() for value in self.original.values())
+        contexts = changed + [""] if changed and numeric else changed
+        for context in contexts:
+            if (yield from self._boolean(context)):
+                return [SqlInjection(self.action_url, None, "boolean")]
+
+        if TIME_PROBE_ALL_FORMS:
+            contexts = list(QUOTES) + [""] if numeric else list(QUOTES)
+        for context in contexts:
+            dbms = yield from self._time(context)
+            if dbms:
+                return [SqlInjection(self.action_url, dbms, "time")]
+
+        return [Info("No SQL injection attack vulnerability detected")]
+
+    def _boolean(self, quote):
+        """Whether true and false conditions after quote split the responses, BOOLEAN_ROUNDS times over."""
+        for _ in range(BOOLEAN_ROUNDS):
+            a, b = random.sample(range(1000, 10000), 2)
+            true = yield from self._send(f"{quote} AND {quote}{a}{quote}={quote}{a}" if quote else f" AND {a}={a}")
+            self.latencies.append(true.latency)
+            if not alike(true, self.baseline):
+                return False
+            false = yield from self._send(f"{quote} AND {quote}{a}{quote}={quote}{b}" if quote else f" AND {a}={b}")
+            self.latencies.append(false.latency)
+            if alike(false, self.baseline) or alike(false, true):
+                return False
+        return True
+
+    def _time(self, quote):
+        """The DBMS whose sleep payload after quote delays the response reliably, or None."""
+        if None in self.latencies:
+            return None
+        mean = statistics.fmean(self.latencies)
+        spread = TIME_DEVIATIONS * statistics.pstdev(self.latencies)
+        delay = max(TIME_MIN_DELAY, math.ceil(2 * spread))
+        if delay > TIME_MAX_DELAY:
+            return None
+        # Half the sleep above normal is beyond the spread of normal latencies
+        slow = mean + delay / 2
+
+        for dbms, (string, number) in TIME_PAYLOADS.items():
+            template = string if quote else number
+            probe = yield from self._send(template.format(q=quote, d=delay))
+            if probe.latency < slow:
+                continue
+            control = yield from self._send(template.format(q=quote, d=0))
+            if control.latency >= slow:
+                continue
+            self.latencies.append(control.latency)
+            probe = yield from self._send(template.format(q=quote, d=delay))
+            if probe.latency >= slow:
+                return dbms
+        return None
+
+
+class BaselineStore:
+    """Baseline signatures of recently tested forms, kept in a cache.ResultCache."""
+
+    def __init__(self, cache, ttl=BASELINE_TTL):
+        self.cache = cache
+        self.ttl = ttl
+
+    def _key(self, form_key):
+        return json.dumps(["sqli baseline", form_key])
+
+    def get(self, form_key):
+        """The fresh stored Signature for a form fingerprint (JSON), or None."""
+        entry = self.cache.get(self._key(form_key))
+        if entry is None or not entry.fresh:
+            return None
+        return Signature.from_dict(entry.value)
+
+    def save(self, form_key, signature):
+        self.cache.set(self._key(form_key), signature.to_dict(), self.ttl)